@@ -7,13 +7,14 @@ polling for results, and monitoring service health.
 import os
 import sys
 import time
+import asyncio
 import psutil
 from contextlib import asynccontextmanager
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from app import __version__
 from app.config import settings
@@ -100,6 +101,12 @@ if settings.otlp_enabled and settings.otlp_endpoint:
         logger.warning("opentelemetry packages not installed, tracing disabled")
 
 
+# Job event streams: seconds between job store checks, and between
+# keep-alive comments while nothing changes
+EVENT_CHECK_INTERVAL = 0.5
+EVENT_KEEPALIVE_INTERVAL = 15
+
+
 # Global dedupe service instance
 _dedupe_service: Optional[DedupeService] = None
 
@@ -238,6 +245,58 @@ async def get_job_status(job_id: str) -> AutoDistillResponse:
     return AutoDistillResponse(**job_data)
 
 
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str) -> StreamingResponse:
+    """Stream a job's status as Server-Sent Events.
+
+    Each event carries the same JSON document as GET /api/jobs/{job_id}.
+    An event is sent whenever the status or progress changes, and the
+    stream closes after the job finishes.
+
+    Args:
+        job_id: The job ID returned from POST /api/autoDistill
+
+    Returns:
+        A text/event-stream response
+    """
+    job_manager = get_job_manager()
+    if job_manager.get_job_status(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def events():
+        last_payload = None
+        last_sent = time.monotonic()
+
+        while True:
+            job_data = job_manager.get_job_status(job_id)
+            if job_data is None:
+                return
+
+            payload = AutoDistillResponse(**job_data).model_dump_json()
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload = payload
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= EVENT_KEEPALIVE_INTERVAL:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+
+            if job_data.get("status") in ["success", "failure", "timeout"]:
+                if _job_counter:
+                    _job_counter.labels(status=job_data["status"]).inc()
+                if _active_jobs_gauge:
+                    _active_jobs_gauge.set(job_manager.get_active_job_count())
+                return
+
+            await asyncio.sleep(EVENT_CHECK_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 @app.delete("/api/jobs/{job_id}")
 async def delete_job(job_id: str) -> dict:
     """Delete a job (admin endpoint).
@@ -33,3 +33,12 @@ def test_docs_available():
     client = TestClient(app)
     response = client.get("/docs")
     assert response.status_code == 200
+
+
+def test_job_events_unknown_job():
+    """Test event stream returns 404 for an unknown job."""
+    from app.api import app
+
+    client = TestClient(app)
+    response = client.get("/api/jobs/no-such-job/events")
+    assert response.status_code == 404
@@ -18,6 +18,7 @@ from .metrics import (
     ENTERPRISE_DUP_FACTOR,
     DEFAULT_TOKEN_COST_PER_MILLION,
     calculate_vector_improvement,
+    calculate_vector_improvements,
     calculate_word_improvement,
     calculate_char_improvement,
     calculate_aggregate_performance,
@@ -48,6 +49,7 @@ __all__ = [
     'generate_word_frequency_chart',
     'generate_performance_chart',
     'calculate_vector_improvement',
+    'calculate_vector_improvements',
     'calculate_word_improvement',
     'calculate_char_improvement',
     'calculate_aggregate_performance',
@@ -5,10 +5,13 @@ Ported from blockify-frontend/src/components/.../reports/lib/reportMath.ts
 All calculations should use these functions to ensure consistency.
 """
 
+import re
 import math
 from typing import List, Dict, Any, Optional, Tuple
 from collections import Counter
 
+import numpy as np
+
 
 # Constants (matching frontend)
 CHAR_TO_TOKEN_RATIO = 4
@@ -33,6 +36,9 @@ STOP_WORDS = frozenset([
     'very', 'too', 'each', 'which', 'who', 'whom', 'what', 'these', 'those'
 ])
 
+# Words for frequency analysis, matched against lowercased text
+_WORD_RE = re.compile(r'\b[a-z]+\b')
+
 
 def calculate_vector_improvement(chunk_distance: float, distilled_distance: float) -> float:
     """Calculate vector accuracy improvement factor.
@@ -51,6 +57,33 @@ def calculate_vector_improvement(chunk_distance: float, distilled_distance: floa
     return chunk_distance / distilled_distance
 
 
+def calculate_vector_improvements(
+    chunk_distances: List[float],
+    distilled_distances: List[float]
+) -> np.ndarray:
+    """Calculate vector accuracy improvement factors for many pairs at once.
+
+    Array form of calculate_vector_improvement, e.g. for per-query
+    distances. Pairs where either distance is missing, NaN or not
+    positive get 0.
+
+    Args:
+        chunk_distances: Distances for traditional chunking
+        distilled_distances: Matching distances for Blockify distilled results
+
+    Returns:
+        Array of improvement factors, one per pair
+    """
+    chunk = np.asarray(chunk_distances, dtype=np.float64)
+    distilled = np.asarray(distilled_distances, dtype=np.float64)
+    if chunk.shape != distilled.shape:
+        raise ValueError("chunk_distances and distilled_distances must have the same length")
+
+    # NaN (also what None becomes) fails both comparisons
+    valid = (chunk > 0) & (distilled > 0)
+    return np.divide(chunk, distilled, out=np.zeros_like(chunk), where=valid)
+
+
 def calculate_word_improvement(document_words: int, distilled_words: int) -> float:
     """Calculate word count improvement factor.
 
@@ -185,21 +218,27 @@ def calculate_average_distance(distances: List[float]) -> float:
     Returns:
         Average distance, or 0 if invalid input
     """
-    if not distances:
+    if distances is None or len(distances) == 0:
         return 0.0
 
-    valid = [d for d in distances if isinstance(d, (int, float)) and not math.isnan(d)]
-    if not valid:
+    # None and other non-numeric entries become NaN and are dropped with it
+    values = np.fromiter(
+        (d if isinstance(d, (int, float)) else np.nan for d in distances),
+        dtype=np.float64,
+        count=len(distances)
+    )
+    valid = values[~np.isnan(values)]
+    if not valid.size:
         return 0.0
 
-    return sum(valid) / len(valid)
+    return float(valid.mean())
 
 
 def calculate_cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """Calculate cosine similarity between two vectors.
 
-    Note: Assumes vectors are already normalized (OpenAI embeddings are).
-    For normalized vectors, dot product equals cosine similarity.
+    Vectors are normalized here, so unnormalized input is handled too; for
+    OpenAI embeddings (already unit length) this equals the dot product.
 
     Args:
         vec1: First vector
@@ -208,9 +247,15 @@ def calculate_cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     Returns:
         Cosine similarity (0 to 1)
     """
-    if not vec1 or not vec2 or len(vec1) != len(vec2):
+    if vec1 is None or vec2 is None or len(vec1) == 0 or len(vec1) != len(vec2):
         return 0.0
-    return sum(a * b for a, b in zip(vec1, vec2))
+
+    a = np.asarray(vec1, dtype=np.float64)
+    b = np.asarray(vec2, dtype=np.float64)
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    if not denom:
+        return 0.0
+    return float(np.dot(a, b) / denom)
 
 
 def calculate_cosine_distance(vec1: List[float], vec2: List[float]) -> float:
@@ -328,17 +373,9 @@ def count_words_and_characters(text: str) -> Dict[str, int]:
     if not text:
         return {'word_count': 0, 'char_count': 0}
 
-    # Replace newlines and tabs with spaces
-    normalized = text.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-
-    # Count characters
-    char_count = len(normalized)
-
-    # Count words (split by whitespace)
-    words = [w for w in normalized.split() if w]
-    word_count = len(words)
-
-    return {'word_count': word_count, 'char_count': char_count}
+    # str.split() with no separator splits on any run of whitespace
+    # (newlines and tabs included) and never yields empty strings
+    return {'word_count': len(text.split()), 'char_count': len(text)}
 
 
 def analyze_word_frequencies(text: str, top_n: int = 30) -> List[Tuple[str, int]]:
@@ -354,18 +391,11 @@ def analyze_word_frequencies(text: str, top_n: int = 30) -> List[Tuple[str, int]
     if not text:
         return []
 
-    # Normalize and split into words
-    normalized = text.lower().replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-
-    # Remove punctuation and split
-    import re
-    words = re.findall(r'\b[a-z]+\b', normalized)
+    # Letters-only words; punctuation and whitespace both act as separators
+    words = _WORD_RE.findall(text.lower())
 
-    # Filter stop words and short words
-    filtered = [w for w in words if w not in STOP_WORDS and len(w) > 2]
-
-    # Count frequencies
-    counter = Counter(filtered)
+    # Count frequencies, skipping stop words and short words
+    counter = Counter(w for w in words if len(w) > 2 and w not in STOP_WORDS)
 
     # Return top N
     return counter.most_common(top_n)
@@ -384,11 +414,12 @@ def validate_benchmark_distances(
         distilled_distance: Distance for distilled blocks
 
     Returns:
-        True if all distances are valid positive numbers
+        True if all distances are finite positive numbers
     """
-    for d in [chunk_distance, undistilled_distance, distilled_distance]:
-        if not isinstance(d, (int, float)):
-            return False
-        if math.isnan(d) or d <= 0:
+    for d in (chunk_distance, undistilled_distance, distilled_distance):
+        # isfinite rejects NaN and infinity in one call; bools are ints
+        # but never distances
+        if (not isinstance(d, (int, float)) or isinstance(d, bool)
+                or not math.isfinite(d) or d <= 0):
             return False
     return True
@@ -6,6 +6,7 @@ Orchestrates the benchmark process and generates HTML reports using Jinja2.
 
 import os
 import json
+import sqlite3
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional, List
@@ -47,6 +48,9 @@ from .charts import (
 # Template directory
 TEMPLATE_DIR = Path(__file__).parent / 'templates'
 
+# Source chunk texts written by ingest_to_chromadb.py, keyed by chunk hash
+CHUNK_STORE_FILE = 'source_chunks.sqlite'
+
 
 class BenchmarkRunner:
     """Main benchmark execution class."""
@@ -65,6 +69,7 @@ class BenchmarkRunner:
         self.raw_collection = None
         self.distilled_collection = None
         self.source_dir = source_dir
+        self._chunk_texts: Optional[Dict[str, str]] = None
 
     def _connect_chromadb(self):
         """Connect to ChromaDB."""
@@ -89,11 +94,30 @@ class BenchmarkRunner:
             print("  WARNING: distilled_ideablocks collection not found (distillation may not have been run)")
             self.distilled_collection = None
 
+    def _load_chunk_texts(self) -> Dict[str, str]:
+        """Load the source chunk store (hash -> text), once per run."""
+        if self._chunk_texts is None:
+            self._chunk_texts = {}
+            path = os.path.join(self.config.data_dir, CHUNK_STORE_FILE)
+            if os.path.exists(path):
+                conn = sqlite3.connect(path)
+                try:
+                    self._chunk_texts = dict(conn.execute("SELECT hash, text FROM chunks"))
+                finally:
+                    conn.close()
+        return self._chunk_texts
+
     def _load_blocks(self, collection) -> List[Dict[str, Any]]:
-        """Load all blocks from a collection."""
+        """Load all blocks from a collection.
+
+        Chunk text is read from block metadata when present (older ingests),
+        otherwise resolved from the source chunk store by hash.
+        """
         if not collection:
             return []
 
+        chunk_texts = self._load_chunk_texts()
+
         # Get all items
         results = collection.get(include=['metadatas', 'documents', 'embeddings'])
 
@@ -109,7 +133,8 @@ class BenchmarkRunner:
                 'critical_question': metadata.get('critical_question', ''),
                 'trusted_answer': metadata.get('trusted_answer', ''),
                 'source_document': metadata.get('source_document', ''),
-                'source_chunk_text': metadata.get('source_chunk_text', ''),
+                'source_chunk_text': (metadata.get('source_chunk_text')
+                                      or chunk_texts.get(metadata.get('source_chunk_hash', ''), '')),
                 'source_chunk_index': metadata.get('source_chunk_index', 0),
                 'source_chunk_hash': metadata.get('source_chunk_hash', ''),
                 'tags': metadata.get('tags', ''),
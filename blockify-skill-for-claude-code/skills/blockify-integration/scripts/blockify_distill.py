@@ -17,6 +17,12 @@ import time
 import requests
 from difflib import SequenceMatcher
 
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
 API_KEY = os.environ.get('BLOCKIFY_API_KEY')
 API_URL = 'https://api.blockify.ai/v1/chat/completions'
 SIMILARITY_THRESHOLD = 0.7
@@ -155,8 +161,12 @@ def main():
 
     # Load IdeaBlocks
     print(f"Loading {input_path}...")
-    with open(input_path, 'r') as f:
-        ideablocks = json.load(f)
+    if _ORJSON_AVAILABLE:
+        with open(input_path, 'rb') as f:
+            ideablocks = orjson.loads(f.read())
+    else:
+        with open(input_path, 'r') as f:
+            ideablocks = json.load(f)
 
     print(f"  Loaded {len(ideablocks)} IdeaBlocks")
 
@@ -197,8 +207,12 @@ def main():
 
     # Save
     print(f"Saving to {output_path}...")
-    with open(output_path, 'w') as f:
-        json.dump(distilled, f, indent=2)
+    if _ORJSON_AVAILABLE:
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(distilled, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_path, 'w') as f:
+            json.dump(distilled, f, indent=2)
 
     reduction = (1 - len(distilled) / len(ideablocks)) * 100
     print(f"Done! {len(ideablocks)} -> {len(distilled)} IdeaBlocks ({reduction:.1f}% reduction)")
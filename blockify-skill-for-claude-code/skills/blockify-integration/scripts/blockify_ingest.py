@@ -7,45 +7,82 @@ Usage:
 
 Environment:
     BLOCKIFY_API_KEY - Your Blockify API key
+    BLOCKIFY_PARALLEL_WORKERS - Concurrent API requests (default: 5)
 """
 
 import os
 import sys
 import json
 import re
-import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
 
 API_KEY = os.environ.get('BLOCKIFY_API_KEY')
 API_URL = 'https://api.blockify.ai/v1/chat/completions'
 CHUNK_SIZE = 2000
 OVERLAP = 200
+PARALLEL_WORKERS = int(os.environ.get('BLOCKIFY_PARALLEL_WORKERS', '5'))
+
+# A sentence ends at ". " or at a line break
+_SENTENCE_END = re.compile(r'\.\s|\n')
+
+# Pooled keep-alive session; the adapter retries 429/5xx with exponential backoff
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=max(16, PARALLEL_WORKERS),
+    max_retries=Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['POST'],
+        raise_on_status=False
+    )
+))
 
 
 def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP):
-    """Split text into overlapping chunks at sentence boundaries."""
-    sentences = text.replace('\n', ' ').split('. ')
+    """Split text into overlapping chunks at sentence boundaries.
+
+    Sentence-end offsets are found in one pass and each chunk is sliced
+    straight out of ``text``; the overlap is taken by stepping back
+    ``overlap`` characters and snapping to the nearest sentence boundary.
+    """
+    bounds = [m.end() for m in _SENTENCE_END.finditer(text)]
+    if not bounds or bounds[-1] != len(text):
+        bounds.append(len(text))
+
     chunks = []
-    current = []
-    length = 0
-
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
-        sentence += '. '
-
-        if length + len(sentence) > chunk_size and current:
-            chunks.append(''.join(current))
-            overlap_text = ''.join(current)[-overlap:]
-            current = [overlap_text, sentence]
-            length = len(overlap_text) + len(sentence)
-        else:
-            current.append(sentence)
-            length += len(sentence)
+    start = 0
+    prev = 0  # Last sentence boundary inside the current window
+
+    for end in bounds:
+        if end - start > chunk_size and prev > start:
+            chunk = text[start:prev].strip()
+            if chunk:
+                chunks.append(chunk)
+
+            target = prev - overlap
+            i = bisect_left(bounds, target)
+            if i < len(bounds) and start < bounds[i] < prev:
+                start = bounds[i]
+            else:
+                start = target if target > start else prev
+        prev = end
 
-    if current:
-        chunks.append(''.join(current))
+    tail = text[start:].strip()
+    if tail:
+        chunks.append(tail)
 
     return chunks
 
@@ -81,38 +118,31 @@ def parse_ideablocks(content):
     return parsed
 
 
-def call_api(chunk, retries=3):
-    """Call Blockify API with retry logic."""
-    for attempt in range(retries):
-        try:
-            response = requests.post(
-                API_URL,
-                headers={
-                    'Authorization': f'Bearer {API_KEY}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'ingest',
-                    'messages': [{'role': 'user', 'content': chunk}],
-                    'max_tokens': 8000,
-                    'temperature': 0.5
-                },
-                timeout=60
-            )
-
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            elif response.status_code == 429:
-                wait = 2 ** attempt
-                print(f"  Rate limited, waiting {wait}s...")
-                time.sleep(wait)
-            else:
-                print(f"Error {response.status_code}: {response.text[:100]}")
-                return None
-        except requests.exceptions.Timeout:
-            print("  Timeout, retrying...")
-            time.sleep(2)
-
+def call_api(chunk):
+    """Call Blockify API (the session retries rate limits and server errors)."""
+    try:
+        response = _SESSION.post(
+            API_URL,
+            headers={
+                'Authorization': f'Bearer {API_KEY}',
+                'Content-Type': 'application/json'
+            },
+            json={
+                'model': 'ingest',
+                'messages': [{'role': 'user', 'content': chunk}],
+                'max_tokens': 8000,
+                'temperature': 0.5
+            },
+            timeout=60
+        )
+    except requests.exceptions.RequestException as e:
+        print(f"  Request failed: {e}")
+        return None
+
+    if response.status_code == 200:
+        return response.json()['choices'][0]['message']['content']
+
+    print(f"Error {response.status_code}: {response.text[:100]}")
     return None
 
 
@@ -138,24 +168,29 @@ def main():
     chunks = chunk_text(text)
     print(f"  Split into {len(chunks)} chunks")
 
-    # Process
-    print("Processing chunks...")
+    # Process (map preserves chunk order)
+    print(f"Processing chunks with {PARALLEL_WORKERS} worker(s)...")
+    with ThreadPoolExecutor(max_workers=PARALLEL_WORKERS) as executor:
+        contents = list(executor.map(call_api, chunks))
+
     all_blocks = []
-    for i, chunk in enumerate(chunks):
+    for i, content in enumerate(contents):
         print(f"  Chunk {i+1}/{len(chunks)}...", end=' ')
-        content = call_api(chunk)
         if content:
             blocks = parse_ideablocks(content)
             all_blocks.extend(blocks)
             print(f"{len(blocks)} IdeaBlocks")
         else:
             print("failed")
-        time.sleep(0.5)
 
     # Save
     print(f"Saving to {output_path}...")
-    with open(output_path, 'w') as f:
-        json.dump(all_blocks, f, indent=2)
+    if _ORJSON_AVAILABLE:
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(all_blocks, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_path, 'w') as f:
+            json.dump(all_blocks, f, indent=2)
 
     print(f"Done! Generated {len(all_blocks)} IdeaBlocks")
 
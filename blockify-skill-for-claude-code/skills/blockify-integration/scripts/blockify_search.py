@@ -8,51 +8,75 @@ Usage:
 
 import sys
 import json
+import heapq
 from difflib import SequenceMatcher
 
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
 
 def similarity(a, b):
     """Calculate text similarity using sequence matching."""
     return SequenceMatcher(None, a.lower(), b.lower()).ratio()
 
 
-def search(query, ideablocks, top_k=5):
-    """Search IdeaBlocks by text similarity and keyword matching."""
+def build_index(ideablocks):
+    """Lowercase each block's searchable fields once, for reuse across queries."""
+    index = []
+
+    for ib in ideablocks:
+        keywords = ' '.join(ib.get('keywords', []))
+        index.append({
+            'full_text': f"{ib['name']} {ib['critical_question']} {ib['trusted_answer']} {keywords}".lower(),
+            'name': ib['name'].lower(),
+            'question': ib['critical_question'].lower(),
+            'keywords': keywords.lower()
+        })
+
+    return index
+
+
+def search(query, ideablocks, top_k=5, index=None):
+    """Search IdeaBlocks by text similarity and keyword matching.
+
+    Every block is scored. Pass an index from build_index when running
+    several queries over the same blocks.
+    """
+    if index is None:
+        index = build_index(ideablocks)
+
     scored = []
     query_lower = query.lower()
     query_words = set(query_lower.split())
+    matcher = SequenceMatcher(None, query_lower)
 
-    for ib in ideablocks:
-        # Combine searchable text
-        text = f"{ib['name']} {ib['critical_question']} {ib['trusted_answer']}"
-        keywords = ' '.join(ib.get('keywords', []))
-        full_text = f"{text} {keywords}"
+    for entry, ib in zip(index, ideablocks):
+        full_text = entry['full_text']
 
         # Calculate base similarity score
-        score = similarity(query, full_text)
+        matcher.set_seq2(full_text)
+        score = matcher.ratio()
 
         # Boost for exact phrase matches
-        if query_lower in full_text.lower():
+        if query_lower in full_text:
             score += 0.4
 
         # Boost if query words appear in key fields
-        name_lower = ib['name'].lower()
-        question_lower = ib['critical_question'].lower()
-
         for word in query_words:
-            if word in name_lower:
+            if word in entry['name']:
                 score += 0.15
-            if word in question_lower:
+            if word in entry['question']:
                 score += 0.1
-            if word in keywords.lower():
+            if word in entry['keywords']:
                 score += 0.05
 
         scored.append((score, ib))
 
-    # Sort by score descending
-    scored.sort(key=lambda x: x[0], reverse=True)
-
-    return scored[:top_k]
+    # Top-k by score descending, without sorting the whole list
+    return heapq.nlargest(top_k, scored, key=lambda x: x[0])
 
 
 def format_result(score, ib):
@@ -81,8 +105,12 @@ def main():
 
     # Load knowledge base
     try:
-        with open(kb_path, 'r') as f:
-            ideablocks = json.load(f)
+        if _ORJSON_AVAILABLE:
+            with open(kb_path, 'rb') as f:
+                ideablocks = orjson.loads(f.read())
+        else:
+            with open(kb_path, 'r') as f:
+                ideablocks = json.load(f)
     except FileNotFoundError:
         print(f"Error: File not found: {kb_path}")
         sys.exit(1)
@@ -14,6 +14,7 @@ Environment:
     BLOCKIFY_API_KEY - Required for Blockify API
     OPENAI_API_KEY - Required for embeddings
     IDEABLOCK_DATA_DIR - Data directory (default: ./data/ideablocks)
+    BLOCKIFY_PARALLEL_WORKERS - Concurrent distill API calls (default: 5)
 """
 
 import os
@@ -22,24 +23,79 @@ import json
 import re
 import time
 import hashlib
+import sqlite3
 import argparse
+from array import array
+from bisect import bisect_left, bisect_right
 from datetime import datetime
 from difflib import SequenceMatcher
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import chromadb
 from chromadb.config import Settings
 from openai import OpenAI
 
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from scipy.sparse.csgraph import connected_components
+    _TFIDF_AVAILABLE = True
+except ImportError:
+    _TFIDF_AVAILABLE = False
+
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
+# The numba kernel is only used without scikit-learn, so numba (slow to
+# import) is only loaded then
+_NUMBA_AVAILABLE = False
+if not _TFIDF_AVAILABLE:
+    try:
+        import numpy as np
+        from numba import njit, prange
+        _NUMBA_AVAILABLE = True
+    except ImportError:
+        pass
+
 # Configuration
 BLOCKIFY_API_KEY = os.environ.get('BLOCKIFY_API_KEY')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 DATA_DIR = os.environ.get('IDEABLOCK_DATA_DIR', './data/ideablocks')
 CHROMA_DIR = os.path.join(DATA_DIR, 'chroma_db')
+EMBEDDING_CACHE_PATH = os.path.join(DATA_DIR, 'embeddings_cache.sqlite')
 
 API_URL = 'https://api.blockify.ai/v1/chat/completions'
 EMBEDDING_MODEL = 'text-embedding-3-small'
 EMBEDDING_BATCH_SIZE = 100
+EMBEDDING_WORKERS = 4  # Concurrent embedding requests
+UPDATE_BATCH_SIZE = 1000
+PARALLEL_WORKERS = int(os.environ.get('BLOCKIFY_PARALLEL_WORKERS', '5'))
+# Estimated input tokens per batched distill call; 0 sends one call per
+# cluster. Off by default: a batch is only split back into its clusters if
+# the distill model echoes the cluster-boundary markers
+DISTILL_BATCH_TOKENS = 0
+
+_BOUNDARY_RE = re.compile(r'<!--cluster-boundary id=(\d+)-->')
+
+# Pooled keep-alive session; the adapter retries 429/5xx with exponential backoff
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=max(16, PARALLEL_WORKERS),
+    max_retries=Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['POST'],
+        raise_on_status=False
+    )
+))
 
 
 def log(message, level="INFO"):
@@ -65,11 +121,29 @@ def get_collection(client, collection_type='raw'):
     )
 
 
+def _json_dumps(obj):
+    """Serialize a metadata value to a compact JSON string.
+
+    The stdlib fallback uses orjson's separators so stored metadata is the
+    same whichever encoder is installed.
+    """
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+
+def _json_loads(text):
+    """Parse a JSON metadata string."""
+    if _ORJSON_AVAILABLE:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
 def export_blocks(collection):
     """Export all active blocks from ChromaDB."""
     log(f"Exporting blocks from {collection.name}...")
 
-    results = collection.get(include=["metadatas", "documents"])
+    results = collection.get(include=["metadatas"])
 
     blocks = []
     for i, doc_id in enumerate(results['ids']):
@@ -86,7 +160,7 @@ def export_blocks(collection):
             'trusted_answer': meta.get('trusted_answer', ''),
             'tags': meta.get('tags', ''),
             'keywords': meta.get('keywords', ''),
-            'entities': json.loads(meta.get('entities', '[]')),
+            'entities': _json_loads(meta.get('entities', '[]')),
             'source_document': meta.get('source_document', '')
         })
 
@@ -99,8 +173,18 @@ def similarity(a, b):
     return SequenceMatcher(None, a.lower(), b.lower()).ratio()
 
 
-def cluster_within_groups(blocks, threshold=0.7):
-    """Cluster blocks within the given list."""
+def _cluster_pairwise(blocks, threshold):
+    """Greedy pairwise clustering with difflib (fallback without scikit-learn or numba).
+
+    ratio() is at most 2 * min(la, lb) / (la + lb), so only blocks whose
+    answer length lies in a window around the seed's length can reach the
+    threshold. Those candidates are found by bisecting a length-sorted index,
+    then screened with the cheap quick-ratio upper bounds before ratio().
+    """
+    answers = [b['trusted_answer'].lower() for b in blocks]
+    by_length = sorted(range(len(blocks)), key=lambda k: len(answers[k]))
+    lengths = [len(answers[k]) for k in by_length]
+
     clusters = []
     used = set()
 
@@ -111,13 +195,24 @@ def cluster_within_groups(blocks, threshold=0.7):
         cluster = [b1]
         used.add(i)
 
-        for j, b2 in enumerate(blocks):
+        if threshold > 0:
+            length = len(answers[i])
+            lo = bisect_left(lengths, length * threshold / (2 - threshold) * (1 - 1e-9))
+            hi = bisect_right(lengths, length * (2 - threshold) / threshold * (1 + 1e-9))
+            candidates = sorted(by_length[lo:hi])
+        else:
+            candidates = range(len(blocks))
+
+        matcher = SequenceMatcher(None, answers[i])
+        for j in candidates:
             if j in used:
                 continue
 
-            sim = similarity(b1['trusted_answer'], b2['trusted_answer'])
-            if sim >= threshold:
-                cluster.append(b2)
+            matcher.set_seq2(answers[j])
+            if (matcher.real_quick_ratio() >= threshold
+                    and matcher.quick_ratio() >= threshold
+                    and matcher.ratio() >= threshold):
+                cluster.append(blocks[j])
                 used.add(j)
 
         clusters.append(cluster)
@@ -125,6 +220,124 @@ def cluster_within_groups(blocks, threshold=0.7):
     return clusters
 
 
+def _cluster_tfidf(blocks, threshold):
+    """Cluster blocks as connected components of a TF-IDF similarity graph.
+
+    Character n-gram TF-IDF rows are L2-normalized, so the sparse product
+    ``X @ X.T`` is the cosine similarity matrix. Thresholding it gives an
+    adjacency matrix whose connected components are the clusters.
+    """
+    answers = [b['trusted_answer'] for b in blocks]
+    vectors = TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 5)).fit_transform(answers)
+    adjacency = (vectors @ vectors.T) >= threshold
+    _, labels = connected_components(adjacency, directed=False)
+
+    # Group by component label, keeping clusters in order of first appearance
+    by_label = {}
+    for block, label in zip(blocks, labels):
+        by_label.setdefault(label, []).append(block)
+
+    return list(by_label.values())
+
+
+if _NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _trigram_codes(row, length):
+        """Sorted unique 24-bit trigram codes of one encoded string."""
+        if length < 3:
+            return np.empty(0, dtype=np.int32)
+        codes = np.empty(length - 2, dtype=np.int32)
+        for k in range(length - 2):
+            codes[k] = (row[k] << 16) | (row[k + 1] << 8) | row[k + 2]
+        return np.unique(codes)
+
+    @njit(parallel=True, cache=True)
+    def _trigram_adjacency(encoded, lengths, threshold):
+        """Boolean matrix of pairs whose trigram Jaccard is >= threshold."""
+        n = encoded.shape[0]
+        grams = [_trigram_codes(encoded[i], lengths[i]) for i in range(n)]
+        adjacency = np.zeros((n, n), dtype=np.bool_)
+        for i in prange(n):
+            a = grams[i]
+            for j in range(i + 1, n):
+                b = grams[j]
+                # Intersection of two sorted arrays by merging
+                x = y = common = 0
+                while x < a.size and y < b.size:
+                    if a[x] == b[y]:
+                        common += 1
+                        x += 1
+                        y += 1
+                    elif a[x] < b[y]:
+                        x += 1
+                    else:
+                        y += 1
+                union = a.size + b.size - common
+                if union > 0 and common >= threshold * union:
+                    adjacency[i, j] = True
+                    adjacency[j, i] = True
+        return adjacency
+
+
+def _cluster_trigram(blocks, threshold):
+    """Greedy clustering on a numba-computed trigram Jaccard adjacency matrix.
+
+    Same greedy order as _cluster_pairwise, with ratio() replaced by the
+    Jaccard overlap of lowercased character trigrams.
+    """
+    answers = [b['trusted_answer'].lower().encode('ascii', 'replace')
+               for b in blocks]
+    encoded = np.zeros((len(answers), max(map(len, answers), default=0) or 1),
+                       dtype=np.uint8)
+    lengths = np.empty(len(answers), dtype=np.int64)
+    for i, answer in enumerate(answers):
+        encoded[i, :len(answer)] = np.frombuffer(answer, dtype=np.uint8)
+        lengths[i] = len(answer)
+
+    adjacency = _trigram_adjacency(encoded, lengths, threshold)
+
+    clusters = []
+    used = np.zeros(len(blocks), dtype=np.bool_)
+    for i in range(len(blocks)):
+        if used[i]:
+            continue
+        members = np.flatnonzero(adjacency[i] & ~used)
+        used[i] = True
+        used[members] = True
+        clusters.append([blocks[i]] + [blocks[j] for j in members])
+
+    return clusters
+
+
+if _NUMBA_AVAILABLE:
+    # Compile (or load from the on-disk cache) before the first real call
+    _cluster_trigram([{'trusted_answer': 'warm up'}] * 2, 0.7)
+
+
+def cluster_within_groups(blocks, threshold=0.7):
+    """Cluster blocks within the given list."""
+    if len(blocks) < 2:
+        return [[b] for b in blocks]
+
+    if _TFIDF_AVAILABLE:
+        try:
+            return _cluster_tfidf(blocks, threshold)
+        except ValueError:
+            # Empty vocabulary (e.g. all answers blank) - use pairwise
+            # matching (numba is not loaded alongside scikit-learn)
+            pass
+
+    if _NUMBA_AVAILABLE:
+        return _cluster_trigram(blocks, threshold)
+
+    return _cluster_pairwise(blocks, threshold)
+
+
+def _source_of(block):
+    """Source document a block came from, for grouping."""
+    return block.get('source_document', 'unknown')
+
+
 def cluster_similar(blocks, threshold=0.7, global_pass=True):
     """Group similar blocks based on answer similarity.
 
@@ -134,18 +347,14 @@ def cluster_similar(blocks, threshold=0.7, global_pass=True):
     """
     log(f"Clustering with threshold {threshold}...")
 
-    # Pass 1: Group by source document and cluster within
-    by_source = {}
-    for block in blocks:
-        source = block.get('source_document', 'unknown')
-        if source not in by_source:
-            by_source[source] = []
-        by_source[source].append(block)
+    # Pass 1: Group by source document and cluster within. The sort is
+    # stable, so blocks keep their relative order inside each document.
+    by_source = [list(group) for _, group in groupby(sorted(blocks, key=_source_of), key=_source_of)]
 
     log(f"  Pass 1: Clustering within {len(by_source)} source documents...")
 
     doc_clusters = []
-    for source, source_blocks in by_source.items():
+    for source_blocks in by_source:
         clusters = cluster_within_groups(source_blocks, threshold)
         doc_clusters.extend(clusters)
 
@@ -223,8 +432,8 @@ def parse_distilled(content):
         if not all([name, question, answer]):
             continue
 
-        # Generate ID from content
-        content_hash = hashlib.sha256(f"{name}{question}{answer}".encode()).hexdigest()[:16]
+        # Generate ID from content (8-byte BLAKE2b = 16 hex chars)
+        content_hash = hashlib.blake2b(f"{name}{question}{answer}".encode(), digest_size=8).hexdigest()
 
         entities = []
         for entity in re.findall(r'<entity>(.*?)</entity>', block, re.DOTALL):
@@ -246,52 +455,151 @@ def parse_distilled(content):
     return parsed
 
 
-def call_distill_api(blocks_xml, retries=3):
-    """Call Blockify Distill API."""
-    for attempt in range(retries):
-        try:
-            response = requests.post(
-                API_URL,
-                headers={
-                    'Authorization': f'Bearer {BLOCKIFY_API_KEY}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'distill',
-                    'messages': [{'role': 'user', 'content': blocks_xml}],
-                    'max_tokens': 8000,
-                    'temperature': 0.5
-                },
-                timeout=90
-            )
+def pack_clusters(cluster_payloads, max_tokens=DISTILL_BATCH_TOKENS):
+    """Greedily pack cluster XML payloads into batched distill requests.
 
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            elif response.status_code == 429:
-                wait = 2 ** (attempt + 1)
-                log(f"Rate limited, waiting {wait}s...", "WARNING")
-                time.sleep(wait)
-            else:
-                log(f"API error {response.status_code}: {response.text[:200]}", "ERROR")
-                return None
-        except Exception as e:
-            log(f"Exception: {e}", "ERROR")
-            time.sleep(2)
+    Token counts are estimated as len(xml) // 4. A cluster larger than the
+    budget is sent on its own.
+
+    Args:
+        cluster_payloads: List of (cluster_index, xml) tuples
+        max_tokens: Estimated token budget per request
+
+    Returns:
+        List of batches, each a list of (cluster_index, xml) tuples
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+
+    for idx, xml in cluster_payloads:
+        tokens = len(xml) // 4
+        if current and current_tokens + tokens > max_tokens:
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((idx, xml))
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def batch_to_xml(batch):
+    """Join a batch of cluster payloads, marking where each cluster starts."""
+    if len(batch) == 1:
+        return batch[0][1]
+    return ''.join(f'<!--cluster-boundary id={idx}-->{xml}' for idx, xml in batch)
 
+
+def split_batch_response(content):
+    """Split a batched distill response on cluster-boundary markers.
+
+    Returns:
+        Dict of cluster index -> response segment (empty if no markers came back)
+    """
+    parts = _BOUNDARY_RE.split(content)
+    return {int(parts[k]): parts[k + 1] for k in range(1, len(parts), 2)}
+
+
+def call_distill_api(blocks_xml):
+    """Call Blockify Distill API (the session retries rate limits and server errors)."""
+    try:
+        response = _SESSION.post(
+            API_URL,
+            headers={
+                'Authorization': f'Bearer {BLOCKIFY_API_KEY}',
+                'Content-Type': 'application/json'
+            },
+            json={
+                'model': 'distill',
+                'messages': [{'role': 'user', 'content': blocks_xml}],
+                'max_tokens': 8000,
+                'temperature': 0.5
+            },
+            timeout=90
+        )
+    except requests.exceptions.RequestException as e:
+        log(f"Exception: {e}", "ERROR")
+        return None
+
+    if response.status_code == 200:
+        return response.json()['choices'][0]['message']['content']
+
+    log(f"API error {response.status_code}: {response.text[:200]}", "ERROR")
     return None
 
 
+def _embedding_key(text):
+    """Content hash used as the embedding cache key (scoped to the model)."""
+    return hashlib.blake2b(f"{EMBEDDING_MODEL}\0{text}".encode(), digest_size=16).hexdigest()
+
+
+def _open_embedding_cache():
+    """Open the on-disk embedding cache, creating it if needed."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(EMBEDDING_CACHE_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vec BLOB)")
+    return conn
+
+
 def generate_embeddings(texts):
-    """Generate embeddings using OpenAI."""
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    embeddings = []
+    """Generate embeddings using OpenAI.
+
+    Vectors are cached as float32 blobs keyed by content hash, so only
+    texts that have never been embedded before are sent to the API.
+    """
+    keys = [_embedding_key(t) for t in texts]
+    conn = _open_embedding_cache()
+
+    try:
+        # Look up cached vectors (chunked to stay under SQLite's variable limit)
+        vectors = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), 500):
+            batch = unique_keys[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(
+                f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", batch
+            )
+            for key, blob in rows:
+                vec = array('f')
+                vec.frombytes(blob)
+                vectors[key] = vec.tolist()
+
+        missing = {k: t for k, t in zip(keys, texts) if k not in vectors}
+        log(f"  Embedding cache: {len(unique_keys) - len(missing)} hits, {len(missing)} to embed")
 
-    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
-        batch = texts[i:i + EMBEDDING_BATCH_SIZE]
-        response = client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
-        embeddings.extend([item.embedding for item in response.data])
+        if missing:
+            client = OpenAI(api_key=OPENAI_API_KEY)
+            missing_keys = list(missing)
+            missing_texts = list(missing.values())
 
-    return embeddings
+            batches = [missing_texts[i:i + EMBEDDING_BATCH_SIZE]
+                       for i in range(0, len(missing_texts), EMBEDDING_BATCH_SIZE)]
+
+            # Batches are independent; the pool size caps in-flight requests
+            with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor:
+                responses = executor.map(
+                    lambda batch: client.embeddings.create(model=EMBEDDING_MODEL, input=batch),
+                    batches
+                )
+                items = [item for response in responses for item in response.data]
+
+            for key, item in zip(missing_keys, items):
+                vectors[key] = item.embedding
+
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                    [(k, array('f', vectors[k]).tobytes()) for k in missing_keys]
+                )
+    finally:
+        conn.close()
+
+    return [vectors[k] for k in keys]
 
 
 def import_distilled(collection, blocks, source_ids):
@@ -301,13 +609,9 @@ def import_distilled(collection, blocks, source_ids):
 
     log(f"Importing {len(blocks)} distilled blocks...")
 
-    # Deduplicate blocks by ID (keep first occurrence)
-    seen_ids = set()
-    unique_blocks = []
-    for block in blocks:
-        if block['id'] not in seen_ids:
-            seen_ids.add(block['id'])
-            unique_blocks.append(block)
+    # Deduplicate blocks by ID. IDs hash name/question/answer, so duplicates
+    # carry the same content; the dict keeps first-seen order.
+    unique_blocks = list({block['id']: block for block in blocks}.values())
 
     if len(unique_blocks) < len(blocks):
         log(f"  Deduplicated: {len(blocks)} -> {len(unique_blocks)} blocks (removed {len(blocks) - len(unique_blocks)} duplicates)")
@@ -326,11 +630,11 @@ def import_distilled(collection, blocks, source_ids):
             'trusted_answer': block['trusted_answer'],
             'tags': block.get('tags', ''),
             'keywords': block.get('keywords', ''),
-            'entities': json.dumps(block.get('entities', [])),
+            'entities': _json_dumps(block.get('entities', [])),
             'primary_entity': block['entities'][0]['name'] if block.get('entities') else '',
             'primary_entity_type': block['entities'][0]['type'] if block.get('entities') else '',
             'block_type': 'distilled',
-            'source_blocks': json.dumps(source_ids),
+            'source_blocks': _json_dumps(source_ids),
             'source_count': len(source_ids),
             'created_at': timestamp
         })
@@ -349,45 +653,48 @@ def import_distilled(collection, blocks, source_ids):
 
 
 def mark_as_distilled(collection, block_ids):
-    """Mark source blocks as distilled."""
+    """Mark source blocks as distilled.
+
+    update() merges the flag into existing metadata without reading or
+    rewriting documents and embeddings.
+    """
     if not block_ids:
         return
 
     log(f"Marking {len(block_ids)} source blocks as distilled...")
 
-    # Get existing data
-    existing = collection.get(
-        ids=list(block_ids),
-        include=["metadatas", "documents", "embeddings"]
-    )
-
-    if not existing['ids']:
-        return
-
-    # Update metadata
+    ids = list(block_ids)
     timestamp = datetime.utcnow().isoformat()
-    updated_metas = []
-    for meta in existing['metadatas']:
-        updated = dict(meta)
-        updated['distilled'] = True
-        updated['distilled_at'] = timestamp
-        updated_metas.append(updated)
-
-    collection.upsert(
-        ids=existing['ids'],
-        metadatas=updated_metas,
-        documents=existing['documents'],
-        embeddings=existing['embeddings']
-    )
-
-
-def run_distillation(threshold=0.7, max_cluster_size=15, dry_run=False):
-    """Run the full distillation pipeline."""
+    for i in range(0, len(ids), UPDATE_BATCH_SIZE):
+        batch = ids[i:i + UPDATE_BATCH_SIZE]
+        collection.update(
+            ids=batch,
+            metadatas=[{'distilled': True, 'distilled_at': timestamp}
+                       for _ in batch]
+        )
+
+
+def run_distillation(threshold=0.7, max_cluster_size=15, dry_run=False,
+                     parallel_workers=PARALLEL_WORKERS,
+                     batch_tokens=DISTILL_BATCH_TOKENS, batch_interval_ms=0):
+    """Run the full distillation pipeline.
+
+    Args:
+        threshold: Similarity threshold for clustering
+        max_cluster_size: Max blocks from one cluster per distill call
+        dry_run: Cluster only, do not call the API
+        parallel_workers: Concurrent distill API calls
+        batch_tokens: Estimated token budget for packing small clusters
+            into one distill call (0 = one call per cluster)
+        batch_interval_ms: Delay between dispatching batched calls
+    """
     log("=" * 60)
     log("BLOCKIFY DISTILLATION (Direct API)")
     log("=" * 60)
     log(f"Similarity threshold: {threshold}")
     log(f"Max cluster size: {max_cluster_size}")
+    log(f"Parallel workers: {parallel_workers}")
+    log(f"Batch token budget: {batch_tokens}")
     log(f"Dry run: {dry_run}")
     log("=" * 60)
 
@@ -424,38 +731,60 @@ def run_distillation(threshold=0.7, max_cluster_size=15, dry_run=False):
     distilled_blocks = []
     all_source_ids = set()
 
+    # Single blocks are copied as-is with a new ID
+    to_merge = {}
     for i, cluster in enumerate(clusters):
-        if len(cluster) == 1:
-            # Single block, copy as-is with new ID
-            block = cluster[0]
-            distilled_blocks.append({
-                'id': f"distilled_{block['id'].replace('ib_', '')}",
-                'name': block['name'],
-                'critical_question': block['critical_question'],
-                'trusted_answer': block['trusted_answer'],
-                'tags': block.get('tags', ''),
-                'keywords': block.get('keywords', ''),
-                'entities': block.get('entities', [])
-            })
-            all_source_ids.add(block['id'])
-        else:
-            # Merge cluster via API
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Merging cluster {i+1}: {len(cluster)} blocks...", end=' ', flush=True)
-
-            # Limit cluster size
-            to_merge = cluster[:max_cluster_size]
-            xml = ''.join([block_to_xml(b) for b in to_merge])
+        if len(cluster) > 1:
+            to_merge[i] = cluster[:max_cluster_size]
+            continue
 
-            result = call_distill_api(xml)
+        block = cluster[0]
+        distilled_blocks.append({
+            'id': f"distilled_{block['id'].replace('ib_', '')}",
+            'name': block['name'],
+            'critical_question': block['critical_question'],
+            'trusted_answer': block['trusted_answer'],
+            'tags': block.get('tags', ''),
+            'keywords': block.get('keywords', ''),
+            'entities': block.get('entities', [])
+        })
+        all_source_ids.add(block['id'])
+
+    # Pack small clusters together so each API call carries more work
+    payloads = [(i, ''.join([block_to_xml(b) for b in members])) for i, members in to_merge.items()]
+    batches = pack_clusters(payloads, batch_tokens) if batch_tokens > 0 else [[p] for p in payloads]
+    log(f"Distilling {len(to_merge)} clusters in {len(batches)} API calls...")
+
+    with ThreadPoolExecutor(max_workers=parallel_workers) as executor:
+        futures = []
+        for batch in batches:
+            futures.append(executor.submit(call_distill_api, batch_to_xml(batch)))
+            if batch_interval_ms:
+                time.sleep(batch_interval_ms / 1000)
+
+        for batch, future in zip(batches, futures):
+            cluster_ids = [idx for idx, _ in batch]
+            sources = [b for idx in cluster_ids for b in to_merge[idx]]
+            label = ', '.join(str(idx + 1) for idx in cluster_ids)
+
+            result = future.result()
             if result:
-                merged = parse_distilled(result)
-                distilled_blocks.extend(merged)
-                for b in to_merge:
+                segments = split_batch_response(result) if len(batch) > 1 else {}
+                if set(segments) == set(cluster_ids):
+                    # Markers survived - attribute output back to each cluster
+                    for idx in cluster_ids:
+                        merged = parse_distilled(segments[idx])
+                        distilled_blocks.extend(merged)
+                        log(f"Merged cluster {idx+1}: {len(to_merge[idx])} blocks -> {len(merged)} blocks")
+                else:
+                    merged = parse_distilled(result)
+                    distilled_blocks.extend(merged)
+                    log(f"Merged cluster(s) {label}: {len(sources)} blocks -> {len(merged)} blocks")
+                for b in sources:
                     all_source_ids.add(b['id'])
-                print(f" -> {len(merged)} blocks")
             else:
                 # Keep originals on failure
-                for b in to_merge:
+                for b in sources:
                     distilled_blocks.append({
                         'id': f"distilled_{b['id'].replace('ib_', '')}",
                         'name': b['name'],
@@ -466,9 +795,7 @@ def run_distillation(threshold=0.7, max_cluster_size=15, dry_run=False):
                         'entities': b.get('entities', [])
                     })
                     all_source_ids.add(b['id'])
-                print(" -> FAILED, keeping originals")
-
-            time.sleep(0.5)  # Rate limiting
+                log(f"Merging cluster(s) {label} FAILED, keeping {len(sources)} originals", "WARNING")
 
     # Import to distilled collection
     imported = import_distilled(distilled_collection, distilled_blocks, list(all_source_ids))
@@ -495,16 +822,28 @@ def main():
     parser.add_argument('--threshold', '-t', type=float, default=0.7,
                        help='Similarity threshold for clustering (default: 0.7)')
     parser.add_argument('--max-cluster', '-m', type=int, default=15,
-                       help='Max blocks per distill call (default: 15)')
+                       help='Max blocks from one cluster per distill call (default: 15)')
     parser.add_argument('--dry-run', '-n', action='store_true',
                        help='Cluster only, do not call API')
+    parser.add_argument('--parallel', '-p', type=int, default=PARALLEL_WORKERS,
+                       metavar='N',
+                       help=f'Concurrent distill API calls (default: {PARALLEL_WORKERS})')
+    parser.add_argument('--batch-tokens', type=int, default=DISTILL_BATCH_TOKENS,
+                       help=f'Token budget for packing small clusters into one call, or 0 '
+                            f'for one call per cluster; batching needs a distill model that '
+                            f'echoes the cluster-boundary markers (default: {DISTILL_BATCH_TOKENS})')
+    parser.add_argument('--batch-interval-ms', type=int, default=0,
+                       help='Delay between dispatching distill calls in ms (default: 0)')
 
     args = parser.parse_args()
 
     success = run_distillation(
         threshold=args.threshold,
         max_cluster_size=args.max_cluster,
-        dry_run=args.dry_run
+        dry_run=args.dry_run,
+        parallel_workers=args.parallel,
+        batch_tokens=args.batch_tokens,
+        batch_interval_ms=args.batch_interval_ms
     )
 
     sys.exit(0 if success else 1)
@@ -10,44 +10,109 @@ Usage:
     python ingest_to_chromadb.py docs/ --batch --sequential
 
 Options:
-    --parallel, -p N    Number of parallel workers (default: 5)
+    --parallel, -p N    Concurrent Blockify calls across all files (default: 5)
     --sequential, -s    Force sequential processing (disable parallelization)
+    --bulk              Persist the HNSW index once at the end of a large load
 
 Environment:
     BLOCKIFY_API_KEY - Required for Blockify API
     OPENAI_API_KEY - Required for embeddings
     IDEABLOCK_DATA_DIR - Data directory (default: ./data/ideablocks)
     BLOCKIFY_PARALLEL_WORKERS - Default parallel workers (default: 5)
+    BLOCKIFY_RPM - Blockify requests per minute budget (default: 60)
+    OPENAI_EMBEDDING_RPM - Embedding requests per minute budget (default: 3000)
+    OPENAI_EMBEDDING_TPM - Embedding tokens per minute budget (default: 1000000)
+    OPENAI_EMBEDDING_WORKERS - Concurrent embedding requests (default: 8)
 """
 
+import io
 import os
 import sys
 import re
+import html
 import json
 import time
+import mmap
+import sqlite3
 import hashlib
 import argparse
+from bisect import bisect_left
 from datetime import datetime
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from xml.parsers import expat
+from concurrent.futures import ThreadPoolExecutor
 import threading
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import chromadb
 from chromadb.config import Settings
 from openai import OpenAI
 
+try:
+    from lxml import etree
+    _LXML_AVAILABLE = True
+except ImportError:
+    _LXML_AVAILABLE = False
+
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
 # Configuration
 BLOCKIFY_API_KEY = os.environ.get('BLOCKIFY_API_KEY')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 DATA_DIR = os.environ.get('IDEABLOCK_DATA_DIR', './data/ideablocks')
 CHROMA_DIR = os.path.join(DATA_DIR, 'chroma_db')
+CHUNK_STORE_PATH = os.path.join(DATA_DIR, 'source_chunks.sqlite')
+RESPONSE_CACHE_PATH = os.path.join(DATA_DIR, 'blockify_cache.sqlite')
 
 CHUNK_SIZE = 2000
 OVERLAP = 200
 EMBEDDING_MODEL = 'text-embedding-3-small'
 EMBEDDING_BATCH_SIZE = 100
+EMBEDDING_WORKERS = int(os.environ.get('OPENAI_EMBEDDING_WORKERS', '8'))
+EMBEDDING_RPM = int(os.environ.get('OPENAI_EMBEDDING_RPM', '3000'))
+EMBEDDING_TPM = int(os.environ.get('OPENAI_EMBEDDING_TPM', '1000000'))
+UPSERT_BATCH_SIZE = 250
+# Inserts the HNSW index buffers before persisting to disk during --bulk
+BULK_SYNC_THRESHOLD = 100000
 PARALLEL_WORKERS = int(os.environ.get('BLOCKIFY_PARALLEL_WORKERS', '5'))
+BLOCKIFY_RPM = int(os.environ.get('BLOCKIFY_RPM', '60'))
+
+# A sentence ends at a period followed by a space or a line break
+_SENTENCE_END = re.compile(rb'\.[ \r\n]')
+
+# Compiled once; parse_ideablocks runs these for every block of every response
+_IDEABLOCK_RE = re.compile(r'<ideablock>(.*?)</ideablock>', re.DOTALL)
+_ENTITY_RE = re.compile(r'<entity>(.*?)</entity>', re.DOTALL)
+_BLOCK_FIELDS = ('name', 'critical_question', 'trusted_answer', 'tags', 'keywords')
+_ENTITY_FIELDS = {'entity_name': 'name', 'entity_type': 'type'}
+_FIELD_PATTERNS = {
+    field: re.compile(f'<{field}>(.*?)</{field}>', re.DOTALL)
+    for field in ('name', 'critical_question', 'trusted_answer', 'tags',
+                  'keywords', 'entity_name', 'entity_type')
+}
+
+# Pooled keep-alive session; the adapter retries 429/5xx with exponential backoff
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=max(16, PARALLEL_WORKERS),
+    max_retries=Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['POST'],
+        raise_on_status=False
+    )
+))
 
 # Thread-safe print lock
 _print_lock = threading.Lock()
@@ -59,6 +124,46 @@ def safe_print(*args, **kwargs):
         print(*args, **kwargs)
 
 
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` calls per `period` seconds."""
+
+    def __init__(self, rate, period=60.0):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / period
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens (capped at the bucket size) are available, then consume them."""
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+# Shared by all worker threads, so the budgets hold across files
+_blockify_limiter = RateLimiter(BLOCKIFY_RPM)
+_embedding_limiter = RateLimiter(EMBEDDING_RPM)
+_embedding_token_limiter = RateLimiter(EMBEDDING_TPM)
+
+
+@lru_cache(maxsize=None)
+def get_openai_client():
+    """Shared OpenAI client (thread-safe; keeps its connection pool warm).
+
+    The SDK retries 429s itself, honouring Retry-After.
+    """
+    return OpenAI(api_key=OPENAI_API_KEY, max_retries=5)
+
+
 def get_chroma_client():
     """Get ChromaDB client."""
     os.makedirs(CHROMA_DIR, exist_ok=True)
@@ -77,90 +182,290 @@ def get_collection(client, collection_type='raw'):
     )
 
 
-def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP):
-    """Split text into overlapping chunks.
+def set_sync_threshold(collection, threshold):
+    """Set how many inserts the collection's HNSW index buffers before persisting.
 
-    Returns:
-        List of dicts with 'text', 'index', and 'hash' keys for benchmark tracking.
+    Returns the previous threshold, or None if this ChromaDB version does not
+    expose HNSW collection configuration.
     """
-    sentences = text.replace('\n', ' ').split('. ')
-    chunks = []
-    current = []
-    length = 0
-
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
-        sentence += '. '
-
-        if length + len(sentence) > chunk_size and current:
-            chunk_text_content = ''.join(current)
-            chunks.append({
-                'text': chunk_text_content,
-                'index': len(chunks),
-                'hash': hashlib.sha256(chunk_text_content.encode()).hexdigest()[:16]
-            })
-            overlap_text = ''.join(current)[-overlap:]
-            current = [overlap_text, sentence]
-            length = len(overlap_text) + len(sentence)
-        else:
-            current.append(sentence)
-            length += len(sentence)
-
-    if current:
-        chunk_text_content = ''.join(current)
-        chunks.append({
-            'text': chunk_text_content,
-            'index': len(chunks),
-            'hash': hashlib.sha256(chunk_text_content.encode()).hexdigest()[:16]
-        })
+    config = getattr(collection, 'configuration', None)
+    hnsw = config.get('hnsw') if isinstance(config, dict) else None
+    if not hnsw:
+        return None
+    collection.modify(configuration={'hnsw': {'sync_threshold': threshold}})
+    return hnsw['sync_threshold']
 
-    return chunks
 
+def _chunk_record(text, index):
+    """Wrap chunk text with its index and hash for benchmark tracking."""
+    return {
+        'text': text,
+        'index': index,
+        'hash': hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+    }
 
-def call_blockify(chunk, retries=3):
-    """Call Blockify Ingest API."""
-    for attempt in range(retries):
-        try:
-            response = requests.post(
-                'https://api.blockify.ai/v1/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {BLOCKIFY_API_KEY}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'ingest',
-                    'messages': [{'role': 'user', 'content': chunk}],
-                    'max_tokens': 8000,
-                    'temperature': 0.5
-                },
-                timeout=60
-            )
 
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            elif response.status_code == 429:
-                time.sleep(2 ** attempt)
+def _decode_chunk(data):
+    """Decode a UTF-8 byte slice with line breaks normalized to spaces."""
+    text = data.decode('utf-8', errors='ignore')
+    return text.replace('\r\n', '\n').replace('\r', '\n').replace('\n', ' ').strip()
+
+
+def chunk_text(data, chunk_size=CHUNK_SIZE, overlap=OVERLAP):
+    """Yield overlapping chunks of a UTF-8 buffer at sentence boundaries.
+
+    ``data`` is any bytes-like object, typically an mmap of the input file.
+    Sentence ends are found lazily in one finditer pass and each chunk is
+    decoded from its own slice, so the file is never decoded or held as a
+    whole and the first chunk is available immediately. The overlap is taken
+    by stepping back ``overlap`` bytes and snapping to the nearest sentence
+    boundary.
+
+    Yields:
+        Dicts with 'text', 'index', and 'hash' keys for benchmark tracking.
+    """
+    bounds = []
+    start = 0
+    prev = 0  # Last sentence boundary inside the current window
+    index = 0
+
+    ends = (m.end() for m in _SENTENCE_END.finditer(data))
+    for end in chain(ends, [len(data)]):
+        if bounds and end == bounds[-1]:
+            continue
+        bounds.append(end)
+
+        if end - start > chunk_size and prev > start:
+            chunk = _decode_chunk(data[start:prev])
+            if chunk:
+                yield _chunk_record(chunk, index)
+                index += 1
+
+            target = prev - overlap
+            i = bisect_left(bounds, target)
+            if start < bounds[i] < prev:
+                start = bounds[i]
             else:
-                safe_print(f"    Error {response.status_code}")
-                return None
-        except Exception as e:
-            safe_print(f"    Exception: {e}")
-            time.sleep(2)
+                start = target if target > start else prev
+        prev = end
+
+    tail = _decode_chunk(data[start:])
+    if tail:
+        yield _chunk_record(tail, index)
+
+
+def _open_response_cache():
+    """Open the Blockify response cache (WAL, so worker threads can share it)."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(RESPONSE_CACHE_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cache (hash TEXT PRIMARY KEY, response TEXT, ts INTEGER)"
+    )
+    return conn
 
+
+def call_blockify(chunk, chunk_hash=None):
+    """Call Blockify Ingest API (the session retries rate limits and server errors).
+
+    When ``chunk_hash`` is given, a response cached for that chunk by an
+    earlier run is returned without calling the API, and successful responses
+    are cached for later runs.
+    """
+    if chunk_hash:
+        conn = _open_response_cache()
+        try:
+            row = conn.execute(
+                "SELECT response FROM cache WHERE hash = ?", (chunk_hash,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row:
+            return row[0]
+
+    content = _post_blockify(chunk)
+
+    if content and chunk_hash:
+        conn = _open_response_cache()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (hash, response, ts) VALUES (?, ?, ?)",
+                    (chunk_hash, content, int(time.time()))
+                )
+        finally:
+            conn.close()
+
+    return content
+
+
+def _post_blockify(chunk):
+    """Send one chunk to the Blockify Ingest API."""
+    _blockify_limiter.acquire()
+    try:
+        response = _SESSION.post(
+            'https://api.blockify.ai/v1/chat/completions',
+            headers={
+                'Authorization': f'Bearer {BLOCKIFY_API_KEY}',
+                'Content-Type': 'application/json'
+            },
+            json={
+                'model': 'ingest',
+                'messages': [{'role': 'user', 'content': chunk}],
+                'max_tokens': 8000,
+                'temperature': 0.5
+            },
+            timeout=60
+        )
+    except requests.exceptions.RequestException as e:
+        safe_print(f"    Exception: {e}")
+        return None
+
+    if response.status_code == 200:
+        return response.json()['choices'][0]['message']['content']
+
+    safe_print(f"    Error {response.status_code}")
     return None
 
 
 def extract_field(xml, field):
-    """Extract field from XML."""
-    match = re.search(f'<{field}>(.*?)</{field}>', xml, re.DOTALL)
-    return match.group(1).strip() if match else ''
+    """Extract field from XML (entity references are decoded, as lxml does)."""
+    match = _FIELD_PATTERNS[field].search(xml)
+    return html.unescape(match.group(1).strip()) if match else ''
+
+
+def _extract_blocks_regex(content):
+    """Pull IdeaBlock fields out of the response with regular expressions."""
+    blocks = []
+    for block in _IDEABLOCK_RE.findall(content):
+        blocks.append({
+            'name': extract_field(block, 'name'),
+            'critical_question': extract_field(block, 'critical_question'),
+            'trusted_answer': extract_field(block, 'trusted_answer'),
+            'tags': extract_field(block, 'tags'),
+            'keywords': extract_field(block, 'keywords'),
+            'entities': [
+                {'name': extract_field(entity, 'entity_name'),
+                 'type': extract_field(entity, 'entity_type')}
+                for entity in _ENTITY_RE.findall(block)
+            ]
+        })
+    return blocks
+
+
+class _MixedContent(Exception):
+    """A field holds child elements, whose markup only the regex path keeps."""
+
+
+def _extract_blocks_lxml(content):
+    """Pull IdeaBlock fields out of the response in one lxml pass.
+
+    Raises etree.XMLSyntaxError if the response is not well-formed, and
+    _MixedContent if a field has child elements (e.g. inline <b> markup).
+    """
+    def text(elem, path):
+        field = elem.find(path)
+        if field is None:
+            return ''
+        if len(field):
+            raise _MixedContent(path)
+        return (field.text or '').strip()
+
+    source = io.BytesIO(b'<root>' + content.encode() + b'</root>')
+    blocks = []
+    for _, elem in etree.iterparse(source, events=('end',), tag='ideablock'):
+        blocks.append({
+            'name': text(elem, './/name'),
+            'critical_question': text(elem, './/critical_question'),
+            'trusted_answer': text(elem, './/trusted_answer'),
+            'tags': text(elem, './/tags'),
+            'keywords': text(elem, './/keywords'),
+            'entities': [
+                {'name': text(entity, './/entity_name'),
+                 'type': text(entity, './/entity_type')}
+                for entity in elem.iter('entity')
+            ]
+        })
+        elem.clear()
+    return blocks
+
+
+def _extract_blocks_expat(content):
+    """Pull IdeaBlock fields out of the response in one SAX-style expat pass.
+
+    A field with child elements (e.g. inline <b> markup) keeps its source
+    up to its own end tag, markup included, as the regex path does. Raises
+    expat.ExpatError if the response is not well-formed.
+    """
+    source = b'<root>' + content.encode() + b'</root>'
+    blocks = []
+    depth = 0
+    block = entity = None
+    capture = None  # [target dict, key, element depth, text parts, source offset, nested]
+
+    def start(tag, attrs):
+        nonlocal depth, block, entity, capture
+        depth += 1
+        if capture:
+            capture[5] = True
+        if tag == 'ideablock':
+            block = {'entities': []}
+        elif block is None:
+            return
+        elif tag == 'entity':
+            entity = {}
+            block['entities'].append(entity)
+        elif capture is None:
+            if tag in _BLOCK_FIELDS and tag not in block:
+                target, key = block, tag
+            elif entity is not None and _ENTITY_FIELDS.get(tag) not in (None, *entity):
+                target, key = entity, _ENTITY_FIELDS[tag]
+            else:
+                return
+            # Content starts after the start tag's closing '>'
+            offset = source.index(b'>', parser.CurrentByteIndex) + 1
+            capture = [target, key, depth, [], offset, False]
+
+    def text(data):
+        if capture:
+            capture[3].append(data)
+
+    def end(tag):
+        nonlocal depth, block, entity, capture
+        if capture and capture[2] == depth:
+            if capture[5]:
+                raw = source[capture[4]:parser.CurrentByteIndex].decode()
+                capture[0][capture[1]] = html.unescape(raw.strip())
+            else:
+                capture[0][capture[1]] = ''.join(capture[3]).strip()
+            capture = None
+        depth -= 1
+        if tag == 'entity':
+            entity = None
+        elif tag == 'ideablock' and block is not None:
+            for field in _BLOCK_FIELDS:
+                block.setdefault(field, '')
+            block['entities'] = [{'name': e.get('name', ''), 'type': e.get('type', '')}
+                                 for e in block['entities']]
+            blocks.append(block)
+            block = None
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start
+    parser.CharacterDataHandler = text
+    parser.EndElementHandler = end
+    parser.Parse(source, True)
+    return blocks
 
 
 def parse_ideablocks(content, source_chunk=None):
     """Parse IdeaBlocks from API response.
 
+    Well-formed responses are parsed in a single pass, with lxml when it is
+    installed and the stdlib expat parser otherwise; malformed ones, and
+    (under lxml) ones with markup inside a field, fall back to regular
+    expressions. All three return the same fields.
+
     Args:
         content: XML content from Blockify API
         source_chunk: Optional dict with 'text', 'index', 'hash' from chunk_text()
@@ -169,35 +474,42 @@ def parse_ideablocks(content, source_chunk=None):
     Returns:
         List of parsed IdeaBlock dicts with source chunk metadata
     """
-    blocks = re.findall(r'<ideablock>(.*?)</ideablock>', content, re.DOTALL)
+    blocks = None
+    if _LXML_AVAILABLE:
+        try:
+            blocks = _extract_blocks_lxml(content)
+        except (etree.XMLSyntaxError, _MixedContent):
+            pass
+    else:
+        try:
+            blocks = _extract_blocks_expat(content)
+        except expat.ExpatError:
+            pass
+    if blocks is None:
+        blocks = _extract_blocks_regex(content)
+
     parsed = []
 
     for block in blocks:
-        name = extract_field(block, 'name')
-        question = extract_field(block, 'critical_question')
-        answer = extract_field(block, 'trusted_answer')
+        name = block['name']
+        question = block['critical_question']
+        answer = block['trusted_answer']
 
         if not all([name, question, answer]):
             continue
 
         # Generate stable ID
-        content_hash = hashlib.sha256(f"{name}{question}{answer}".encode()).hexdigest()[:16]
+        content_hash = hashlib.blake2b(f"{name}{question}{answer}".encode(), digest_size=8).hexdigest()
 
-        # Extract entities
-        entities = []
-        for entity in re.findall(r'<entity>(.*?)</entity>', block, re.DOTALL):
-            entities.append({
-                'name': extract_field(entity, 'entity_name'),
-                'type': extract_field(entity, 'entity_type')
-            })
+        entities = block['entities']
 
         block_data = {
             'id': f"ib_{content_hash}",
             'name': name,
             'critical_question': question,
             'trusted_answer': answer,
-            'tags': extract_field(block, 'tags'),
-            'keywords': extract_field(block, 'keywords'),
+            'tags': block['tags'],
+            'keywords': block['keywords'],
             'entities': entities,
             'primary_entity': entities[0]['name'] if entities else '',
             'primary_entity_type': entities[0]['type'] if entities else ''
@@ -214,138 +526,220 @@ def parse_ideablocks(content, source_chunk=None):
     return parsed
 
 
+def save_source_chunks(blocks):
+    """Store each source chunk's text once, keyed by its hash.
+
+    Block metadata only carries source_chunk_hash/index; the benchmark
+    resolves the text from this table instead of a copy on every block.
+    """
+    rows = {b['source_chunk_hash']: b['source_chunk_text']
+            for b in blocks if 'source_chunk_hash' in b}
+    if not rows:
+        return
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(CHUNK_STORE_PATH)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS chunks (hash TEXT PRIMARY KEY, text TEXT)")
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunks (hash, text) VALUES (?, ?)",
+                rows.items()
+            )
+    finally:
+        conn.close()
+
+
 def generate_embeddings(texts):
-    """Generate embeddings using OpenAI."""
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    embeddings = []
+    """Generate embeddings using OpenAI.
 
-    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
-        batch = texts[i:i + EMBEDDING_BATCH_SIZE]
+    Batches of EMBEDDING_BATCH_SIZE texts are sent by EMBEDDING_WORKERS
+    threads, within both the request and token per-minute budgets (tokens are
+    estimated at four characters each); results come back in input order as
+    one (len(texts), dim) float32 array, which ChromaDB accepts as-is.
+    """
+    client = get_openai_client()
+    batches = [texts[i:i + EMBEDDING_BATCH_SIZE]
+               for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+
+    def embed_batch(batch):
+        _embedding_limiter.acquire()
+        _embedding_token_limiter.acquire(sum(len(text) for text in batch) // 4 + 1)
         response = client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
-        embeddings.extend([item.embedding for item in response.data])
+        return np.asarray([item.embedding for item in response.data], dtype=np.float32)
+
+    with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor:
+        return np.vstack(list(executor.map(embed_batch, batches)))
 
-    return embeddings
 
+def _json_dumps(obj):
+    """Serialize a metadata value to a compact JSON string.
 
-def ingest_to_collection(blocks, collection, source_document, use_safe_print=False):
+    The stdlib fallback uses orjson's separators so stored metadata is the
+    same whichever encoder is installed.
+    """
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+
+def ingest_to_collection(blocks, collection):
     """Ingest parsed blocks to ChromaDB.
 
+    Called once per run with the blocks of every processed file, so all
+    embeddings are generated in a single concurrent pass.
+
     Args:
-        blocks: List of parsed IdeaBlock dicts (may include source_chunk_* fields)
+        blocks: List of parsed IdeaBlock dicts with 'source_document' set
+                (may include source_chunk_index/hash fields)
         collection: ChromaDB collection to ingest into
-        source_document: Source document filename
-        use_safe_print: Use thread-safe printing
 
     Returns:
-        Number of blocks ingested
+        Number of new blocks ingested (blocks already stored are skipped)
     """
-    _print = safe_print if use_safe_print else print
     if not blocks:
         return 0
 
-    # Deduplicate blocks by ID (keep first occurrence)
-    seen_ids = set()
-    unique_blocks = []
+    # Deduplicate blocks by ID (keep first occurrence, in first-seen order)
+    by_id = {}
     for block in blocks:
-        if block['id'] not in seen_ids:
-            seen_ids.add(block['id'])
-            unique_blocks.append(block)
+        by_id.setdefault(block['id'], block)
+    unique_blocks = list(by_id.values())
 
     if len(unique_blocks) < len(blocks):
-        _print(f"    Deduplicated: {len(blocks)} -> {len(unique_blocks)} blocks")
+        print(f"  Deduplicated: {len(blocks)} -> {len(unique_blocks)} blocks")
+
+    # Block IDs hash the block content, so IDs already in the collection
+    # would only re-embed to the vectors stored for them
+    block_ids = list(by_id)
+    existing = set()
+    for i in range(0, len(block_ids), UPSERT_BATCH_SIZE):
+        existing.update(collection.get(ids=block_ids[i:i + UPSERT_BATCH_SIZE], include=[])['ids'])
+
+    if existing:
+        unique_blocks = [block for block in unique_blocks if block['id'] not in existing]
+        print(f"  Skipped {len(existing)} blocks already in {collection.name}")
+
+    if not unique_blocks:
+        return 0
 
     blocks = unique_blocks
 
     ids = []
     documents = []
     metadatas = []
-    timestamp = datetime.utcnow().isoformat()
+    # Fields shared by every block in this run, built once
+    base_metadata = {
+        'block_type': 'raw',
+        'distilled': False,
+        'created_at': datetime.utcnow().isoformat()
+    }
 
     for block in blocks:
         ids.append(block['id'])
         documents.append(f"{block['name']} {block['critical_question']} {block['trusted_answer']}")
 
         metadata = {
+            **base_metadata,
             'name': block['name'],
             'critical_question': block['critical_question'],
             'trusted_answer': block['trusted_answer'],
             'tags': block['tags'],
             'keywords': block['keywords'],
-            'entities': json.dumps(block['entities']),
+            'entities': _json_dumps(block['entities']),
             'primary_entity': block['primary_entity'],
             'primary_entity_type': block['primary_entity_type'],
-            'source_document': source_document,
-            'block_type': 'raw',
-            'distilled': False,
-            'created_at': timestamp
+            'source_document': block['source_document']
         }
 
-        # Add source chunk metadata for benchmark tracking (if available)
-        if 'source_chunk_text' in block:
-            metadata['source_chunk_text'] = block['source_chunk_text']
+        # Add source chunk metadata for benchmark tracking (if available);
+        # the chunk text itself goes to the chunk store, not every block
+        if 'source_chunk_hash' in block:
             metadata['source_chunk_index'] = block['source_chunk_index']
             metadata['source_chunk_hash'] = block['source_chunk_hash']
 
         metadatas.append(metadata)
 
     # Generate embeddings
-    _print(f"    Generating embeddings for {len(documents)} blocks...")
+    print(f"Generating embeddings for {len(documents)} blocks...")
     embeddings = generate_embeddings(documents)
 
-    # Upsert to collection
-    collection.upsert(
-        ids=ids,
-        embeddings=embeddings,
-        documents=documents,
-        metadatas=metadatas
-    )
+    # Upsert to collection in fixed-size micro-batches
+    for i in range(0, len(ids), UPSERT_BATCH_SIZE):
+        end = i + UPSERT_BATCH_SIZE
+        collection.upsert(
+            ids=ids[i:end],
+            embeddings=embeddings[i:end],
+            documents=documents[i:end],
+            metadatas=metadatas[i:end]
+        )
 
     return len(blocks)
 
 
-def process_file(filepath, collection, parallel=False):
-    """Process a single file through Blockify to ChromaDB.
+def submit_file(filepath, executor, slots):
+    """Chunk a file and queue one Blockify call per chunk on the shared pool.
 
-    Args:
-        filepath: Path to the file to process
-        collection: ChromaDB collection to ingest into
-        parallel: If True, use thread-safe printing
+    Chunks are cut from a read-only mapping and submitted as soon as they are
+    found. ``slots`` caps how many calls may be queued or running at once;
+    the chunks and their responses are held until collect_file() runs.
 
     Returns:
-        Number of blocks ingested
+        List of (chunk, future) pairs in chunk order
     """
-    _print = safe_print if parallel else print
-    _print(f"Processing {filepath}...")
+    size = os.path.getsize(filepath)
+    safe_print(f"Processing {filepath} ({size} bytes)...")
 
-    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-        text = f.read()
+    pending = []
+    if not size:
+        return pending
 
-    _print(f"  [{os.path.basename(filepath)}] {len(text)} characters")
+    with open(filepath, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for chunk in chunk_text(data):
+            slots.acquire()
+            # Pass the chunk text (not dict) to Blockify API
+            future = executor.submit(call_blockify, chunk['text'], chunk['hash'])
+            future.add_done_callback(lambda _: slots.release())
+            pending.append((chunk, future))
 
-    chunks = chunk_text(text)
-    _print(f"  [{os.path.basename(filepath)}] Split into {len(chunks)} chunks")
+    return pending
 
+
+def collect_file(filepath, pending):
+    """Parse a file's Blockify responses into IdeaBlocks.
+
+    Responses are consumed in chunk order, so deduplication stays deterministic.
+    Each chunk and its response are dropped from ``pending`` once parsed, and
+    the chunk texts go to the chunk store rather than staying on the blocks.
+
+    Returns:
+        List of parsed IdeaBlock dicts tagged with their 'source_document'
+    """
+    source = os.path.basename(filepath)
     all_blocks = []
-    for i, chunk in enumerate(chunks):
-        _print(f"  [{os.path.basename(filepath)}] Chunk {i+1}/{len(chunks)}...", end=' ')
-        # Pass the chunk text (not dict) to Blockify API
-        content = call_blockify(chunk['text'])
+
+    # Popped from the end, so reversed first to keep chunk order
+    pending.reverse()
+    while pending:
+        chunk, future = pending.pop()
+        content = future.result()
         if content:
             # Pass source chunk info for benchmark tracking
             blocks = parse_ideablocks(content, source_chunk=chunk)
+            for block in blocks:
+                block['source_document'] = source
             all_blocks.extend(blocks)
-            _print(f"{len(blocks)} blocks")
+            safe_print(f"  [{source}] Chunk {chunk['index'] + 1}: {len(blocks)} blocks")
         else:
-            _print("failed")
-        time.sleep(0.5)
+            safe_print(f"  [{source}] Chunk {chunk['index'] + 1}: failed")
 
-    if all_blocks:
-        source = os.path.basename(filepath)
-        count = ingest_to_collection(all_blocks, collection, source, use_safe_print=parallel)
-        _print(f"  [{os.path.basename(filepath)}] Ingested {count} blocks to ChromaDB")
-        return count
+    save_source_chunks(all_blocks)
+    for block in all_blocks:
+        del block['source_chunk_text']
 
-    return 0
+    safe_print(f"  [{source}] Parsed {len(all_blocks)} blocks")
+    return all_blocks
 
 
 def main():
@@ -358,9 +752,11 @@ def main():
                        help='Process directory of files')
     parser.add_argument('--parallel', '-p', type=int, default=PARALLEL_WORKERS,
                        metavar='N',
-                       help=f'Number of parallel workers (default: {PARALLEL_WORKERS}, set via BLOCKIFY_PARALLEL_WORKERS env var)')
+                       help=f'Concurrent Blockify calls across all files (default: {PARALLEL_WORKERS}, set via BLOCKIFY_PARALLEL_WORKERS env var)')
     parser.add_argument('--sequential', '-s', action='store_true',
                        help='Force sequential processing (disable parallelization)')
+    parser.add_argument('--bulk', action='store_true',
+                       help='Persist the HNSW index once at the end instead of every few thousand inserts')
 
     args = parser.parse_args()
 
@@ -378,10 +774,8 @@ def main():
 
     print(f"Target: {collection.name} ({collection.count()} existing blocks)")
 
-    # Process files
-    total = 0
+    # Collect files to process
     if args.batch or os.path.isdir(args.input):
-        # Collect all files to process
         filepaths = []
         for filepath in Path(args.input).glob('**/*.txt'):
             filepaths.append(str(filepath))
@@ -391,30 +785,47 @@ def main():
         if not filepaths:
             print("No .txt or .md files found")
             sys.exit(0)
-
-        num_workers = 1 if args.sequential else args.parallel
-        print(f"Found {len(filepaths)} files to process with {num_workers} worker(s)")
-
-        if num_workers > 1:
-            # Parallel processing
-            with ThreadPoolExecutor(max_workers=num_workers) as executor:
-                futures = {
-                    executor.submit(process_file, fp, collection, True): fp
-                    for fp in filepaths
-                }
-                for future in as_completed(futures):
-                    filepath = futures[future]
-                    try:
-                        result = future.result()
-                        total += result
-                    except Exception as e:
-                        safe_print(f"Error processing {filepath}: {e}")
-        else:
-            # Sequential processing
-            for filepath in filepaths:
-                total += process_file(filepath, collection, parallel=False)
     else:
-        total = process_file(args.input, collection, parallel=False)
+        filepaths = [args.input]
+
+    num_workers = 1 if args.sequential else args.parallel
+    print(f"Found {len(filepaths)} files to process with {num_workers} worker(s)")
+
+    # Stage 1: chunk every file and run the chunks through one shared pool,
+    # so concurrency is capped at num_workers however many files there are.
+    # Each file is collected once the next one has been submitted, so the
+    # pool stays busy while at most two files' chunks are held
+    all_blocks = []
+    slots = threading.BoundedSemaphore(num_workers * 2)
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        previous = None
+        for filepath in chain(filepaths, [None]):
+            current = None
+            if filepath is not None:
+                try:
+                    current = (filepath, submit_file(filepath, executor, slots))
+                except OSError as e:
+                    safe_print(f"Error processing {filepath}: {e}")
+
+            if previous is not None:
+                try:
+                    all_blocks.extend(collect_file(*previous))
+                except Exception as e:
+                    safe_print(f"Error processing {previous[0]}: {e}")
+            previous = current
+
+    # Stage 2: embed and upsert the blocks from all files in one pass
+    previous_threshold = None
+    if args.bulk:
+        previous_threshold = set_sync_threshold(
+            collection, max(BULK_SYNC_THRESHOLD, len(all_blocks)))
+        if previous_threshold is None:
+            print("Note: --bulk needs a ChromaDB version with HNSW collection configuration; ignoring")
+    try:
+        total = ingest_to_collection(all_blocks, collection)
+    finally:
+        if previous_threshold is not None:
+            set_sync_threshold(collection, previous_threshold)
 
     print(f"\n{'='*50}")
     print(f"Total: {total} blocks ingested")
@@ -30,26 +30,66 @@ import sys
 import json
 import time
 import uuid
+import hashlib
+import sqlite3
 import argparse
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import chromadb
 from chromadb.config import Settings
 from openai import OpenAI
 
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
 # Configuration
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 BLOCKIFY_API_KEY = os.environ.get('BLOCKIFY_API_KEY')
 DISTILL_SERVICE_URL = os.environ.get('DISTILL_SERVICE_URL', 'http://localhost:8315')
 DATA_DIR = os.environ.get('IDEABLOCK_DATA_DIR', './data/ideablocks')
 CHROMA_DIR = os.path.join(DATA_DIR, 'chroma_db')
+EMBEDDING_CACHE_PATH = os.path.join(DATA_DIR, 'embeddings_cache.sqlite')
 
 EMBEDDING_MODEL = 'text-embedding-3-small'
 EMBEDDING_BATCH_SIZE = 100
-POLL_INTERVAL = 5  # seconds
+EMBEDDING_WORKERS = 4  # Concurrent embedding requests
+UPSERT_BATCH_SIZE = 250
+UPDATE_BATCH_SIZE = 500
+MIN_POLL_INTERVAL = 1  # seconds
+MAX_POLL_INTERVAL = 30  # seconds
 MAX_POLL_TIME = 7200  # 2 hours max
+EXPORT_PAGE_SIZE = 10000  # Blocks fetched per ChromaDB get() during export
+STREAM_MIN_BLOCKS = 1000  # Larger distillation jobs stream their request body
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes per chunk of a streamed request body
+
+
+# Keep-alive session, so health checks and job polls reuse one connection
+# to the distillation service instead of reconnecting for every request.
+# GETs are retried on gateway errors; job submissions are never retried, so
+# a job is not submitted twice, and a refused connection fails fast.
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=3,
+        connect=0,
+        backoff_factor=0.3,
+        status_forcelist=[502, 503, 504],
+        raise_on_status=False
+    )
+))
+_SESSION.mount('https://', _SESSION.get_adapter('http://'))
 
 
 def log(message, level="INFO"):
@@ -58,6 +98,12 @@ def log(message, level="INFO"):
     print(f"[{timestamp}] [{level}] {message}")
 
 
+@lru_cache(maxsize=None)
+def get_openai_client():
+    """Shared OpenAI client, so every embedding call reuses one connection pool."""
+    return OpenAI(api_key=OPENAI_API_KEY, max_retries=3)
+
+
 def get_chroma_client():
     """Get ChromaDB client."""
     os.makedirs(CHROMA_DIR, exist_ok=True)
@@ -76,6 +122,28 @@ def get_collection(client, collection_type='raw'):
     )
 
 
+def _export_block(doc_id, metadata):
+    """One stored block in the distillation service's format."""
+    block = {
+        "type": "blockify",
+        "blockifyResultUUID": doc_id,
+        "blockifiedTextResult": {
+            "name": metadata.get('name', ''),
+            "criticalQuestion": metadata.get('critical_question', ''),
+            "trustedAnswer": metadata.get('trusted_answer', '')
+        },
+        "hidden": False,
+        "exported": False,
+        "reviewed": False
+    }
+
+    source_document = metadata.get('source_document')
+    if source_document:
+        block["blockifyDocumentUUID"] = source_document
+
+    return block
+
+
 def export_blocks_from_chromadb(collection, limit=None, only_active=True):
     """Export blocks from ChromaDB in distillation service format.
 
@@ -93,73 +161,25 @@ def export_blocks_from_chromadb(collection, limit=None, only_active=True):
 
     log(f"Found {count} total blocks in collection")
 
-    # Fetch all blocks
-    fetch_limit = limit if limit else count
+    # ChromaDB filters out distilled blocks; $ne also matches blocks that
+    # were never flagged. Pages keep memory bounded on large collections.
+    where = {"distilled": {"$ne": True}} if only_active else None
 
-    # Build where clause to filter out already-distilled blocks
-    where = None
-    if only_active:
-        where = {
-            "$or": [
-                {"distilled": {"$eq": False}},
-                {"distilled": {"$exists": False}}
-            ]
-        }
-
-    try:
+    blocks = []
+    offset = 0
+    while limit is None or len(blocks) < limit:
+        page_size = EXPORT_PAGE_SIZE if limit is None else min(EXPORT_PAGE_SIZE, limit - len(blocks))
         results = collection.get(
-            limit=fetch_limit,
             where=where,
-            include=["metadatas", "documents"]
-        )
-    except Exception:
-        # Fallback if where clause fails (older ChromaDB versions)
-        results = collection.get(
-            limit=fetch_limit,
-            include=["metadatas", "documents"]
+            limit=page_size,
+            offset=offset,
+            include=["metadatas"]
         )
-        # Filter manually
-        if only_active:
-            filtered_ids = []
-            filtered_metas = []
-            filtered_docs = []
-            for i, meta in enumerate(results['metadatas']):
-                if not meta.get('distilled', False):
-                    filtered_ids.append(results['ids'][i])
-                    filtered_metas.append(meta)
-                    if results.get('documents'):
-                        filtered_docs.append(results['documents'][i])
-            results = {
-                'ids': filtered_ids,
-                'metadatas': filtered_metas,
-                'documents': filtered_docs if filtered_docs else None
-            }
-
-    blocks = []
-    for i, doc_id in enumerate(results['ids']):
-        metadata = results['metadatas'][i]
-
-        # Skip if already distilled
-        if only_active and metadata.get('distilled', False):
-            continue
-
-        block = {
-            "type": "blockify",
-            "blockifyResultUUID": doc_id,
-            "blockifiedTextResult": {
-                "name": metadata.get('name', ''),
-                "criticalQuestion": metadata.get('critical_question', ''),
-                "trustedAnswer": metadata.get('trusted_answer', '')
-            },
-            "hidden": False,
-            "exported": False,
-            "reviewed": False
-        }
-
-        if metadata.get('source_document'):
-            block["blockifyDocumentUUID"] = metadata.get('source_document')
+        if not results['ids']:
+            break
+        offset += len(results['ids'])
 
-        blocks.append(block)
+        blocks.extend(map(_export_block, results['ids'], results['metadatas']))
 
     log(f"Exported {len(blocks)} active blocks (skipped {count - len(blocks)} already distilled)")
     return blocks
@@ -168,7 +188,7 @@ def export_blocks_from_chromadb(collection, limit=None, only_active=True):
 def check_service_health(service_url):
     """Check if distillation service is healthy."""
     try:
-        response = requests.get(f"{service_url}/health", timeout=10)
+        response = _SESSION.get(f"{service_url}/health", timeout=10)
         if response.status_code == 200:
             return True, response.json()
         return False, f"Status {response.status_code}"
@@ -178,6 +198,28 @@ def check_service_health(service_url):
         return False, str(e)
 
 
+_STREAM_ENCODER = json.JSONEncoder(separators=(',', ':'))
+
+
+def _iter_json_body(payload):
+    """Yield payload as compact JSON in roughly STREAM_CHUNK_SIZE byte pieces.
+
+    iterencode produces one small string per token, so they are joined
+    into larger chunks before going on the wire.
+    """
+    parts = []
+    size = 0
+    for part in _STREAM_ENCODER.iterencode(payload):
+        parts.append(part)
+        size += len(part)
+        if size >= STREAM_CHUNK_SIZE:
+            yield ''.join(parts).encode('utf-8')
+            parts.clear()
+            size = 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
 def submit_distillation_job(service_url, blocks, similarity, iterations):
     """Submit distillation job to service."""
     log(f"Submitting {len(blocks)} blocks to distillation service...")
@@ -192,11 +234,17 @@ def submit_distillation_job(service_url, blocks, similarity, iterations):
     }
 
     try:
-        response = requests.post(
+        if len(blocks) > STREAM_MIN_BLOCKS:
+            # A generator body is sent with chunked transfer encoding, so
+            # the whole payload is never held as one string
+            body = {'data': _iter_json_body(payload), 'timeout': (10, 300)}
+        else:
+            body = {'json': payload, 'timeout': 60}
+
+        response = _SESSION.post(
             f"{service_url}/api/autoDistill",
-            json=payload,
             headers={"Content-Type": "application/json"},
-            timeout=60
+            **body
         )
         response.raise_for_status()
 
@@ -210,16 +258,47 @@ def submit_distillation_job(service_url, blocks, similarity, iterations):
         return None, None
 
 
+def next_poll_interval(interval, percent):
+    """Back off exponentially while a job runs, tightening near completion.
+
+    The wait doubles up to MAX_POLL_INTERVAL but never exceeds that cap
+    scaled by the fraction of work left, so polls speed back up towards
+    MIN_POLL_INTERVAL as progress approaches 100%.
+    """
+    remaining = max(0.0, 1 - percent / 100)
+    return max(MIN_POLL_INTERVAL, min(interval * 2, MAX_POLL_INTERVAL * remaining))
+
+
+def _server_poll_delay(response, data=None):
+    """Wait the service asked for before the next poll, or None.
+
+    A Retry-After header (in seconds) wins, capped at MAX_POLL_INTERVAL;
+    otherwise a progress ETA of more than 2s means polling again a quarter
+    of the way there, up to 10s. Either way the wait is at least
+    MIN_POLL_INTERVAL.
+    """
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return max(MIN_POLL_INTERVAL, min(int(retry_after), MAX_POLL_INTERVAL))
+
+    eta = ((data or {}).get('progress') or {}).get('eta_seconds')
+    if isinstance(eta, (int, float)) and eta > 2:
+        return max(MIN_POLL_INTERVAL, min(eta / 4, 10))
+    return None
+
+
 def poll_job_status(service_url, job_id, max_time=MAX_POLL_TIME):
     """Poll for job completion."""
     log(f"Polling for job completion (max {max_time}s)...")
 
     start_time = time.time()
     last_progress = None
+    interval = MIN_POLL_INTERVAL
 
     while time.time() - start_time < max_time:
         try:
-            response = requests.get(
+            response = _SESSION.get(
                 f"{service_url}/api/jobs/{job_id}",
                 timeout=30
             )
@@ -234,6 +313,8 @@ def poll_job_status(service_url, job_id, max_time=MAX_POLL_TIME):
                 if progress_str != last_progress:
                     log(f"Progress: {progress_str}")
                     last_progress = progress_str
+                    # The job is moving again; check back soon
+                    interval = MIN_POLL_INTERVAL
 
             if status == 'success':
                 log("Job completed successfully!")
@@ -251,27 +332,117 @@ def poll_job_status(service_url, job_id, max_time=MAX_POLL_TIME):
                     return data
                 return None
 
-            time.sleep(POLL_INTERVAL)
+            # A wait suggested by the service overrides the backoff
+            delay = _server_poll_delay(response, data)
+            time.sleep(interval if delay is None else delay)
+            interval = next_poll_interval(interval, (data.get('progress') or {}).get('percent', 0))
 
         except requests.exceptions.RequestException as e:
             log(f"Poll error: {e}", "WARNING")
-            time.sleep(POLL_INTERVAL * 2)
+            delay = _server_poll_delay(getattr(e, 'response', None))
+            time.sleep(interval if delay is None else delay)
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
 
     log(f"Max poll time ({max_time}s) exceeded", "ERROR")
     return None
 
 
+def _embedding_key(text):
+    """Content hash used as the embedding cache key (scoped to the model)."""
+    return hashlib.blake2b(f"{EMBEDDING_MODEL}\0{text}".encode(), digest_size=16).hexdigest()
+
+
+def _open_embedding_cache():
+    """Open the on-disk embedding cache, creating it if needed."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(EMBEDDING_CACHE_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vec BLOB)")
+    return conn
+
+
 def generate_embeddings(texts):
-    """Generate embeddings using OpenAI."""
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    embeddings = []
+    """Generate embeddings using OpenAI.
 
-    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
-        batch = texts[i:i + EMBEDDING_BATCH_SIZE]
-        response = client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
-        embeddings.extend([item.embedding for item in response.data])
+    Vectors are cached as float32 blobs keyed by content hash, so only
+    texts that have never been embedded before are sent to the API; those
+    batches are sent concurrently. Returns one (len(texts), dim) float32
+    array, which ChromaDB accepts as-is.
+    """
+    keys = [_embedding_key(t) for t in texts]
+    conn = _open_embedding_cache()
+
+    try:
+        # Look up cached vectors (chunked to stay under SQLite's variable limit)
+        vectors = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), 500):
+            batch = unique_keys[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(
+                f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", batch
+            )
+            for key, blob in rows:
+                vectors[key] = np.frombuffer(blob, dtype=np.float32)
 
-    return embeddings
+        missing = {k: t for k, t in zip(keys, texts) if k not in vectors}
+        log(f"Embedding cache: {len(unique_keys) - len(missing)} hits, {len(missing)} to embed")
+
+        if missing:
+            client = get_openai_client()
+            missing_keys = list(missing)
+            missing_texts = list(missing.values())
+
+            batches = [missing_texts[i:i + EMBEDDING_BATCH_SIZE]
+                       for i in range(0, len(missing_texts), EMBEDDING_BATCH_SIZE)]
+
+            # Batches are independent; the pool size caps in-flight requests
+            with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor:
+                responses = executor.map(
+                    lambda batch: client.embeddings.create(model=EMBEDDING_MODEL, input=batch),
+                    batches
+                )
+                items = [item for response in responses for item in response.data]
+
+            for key, item in zip(missing_keys, items):
+                vectors[key] = np.asarray(item.embedding, dtype=np.float32)
+
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                    [(k, vectors[k].tobytes()) for k in missing_keys]
+                )
+    finally:
+        conn.close()
+
+    return np.vstack([vectors[k] for k in keys])
+
+
+def upsert_in_batches(collection, ids, **fields):
+    """Upsert in UPSERT_BATCH_SIZE slices so no single call is oversized.
+
+    ``fields`` are the parallel embeddings/documents/metadatas lists; None
+    values are left out of the call. Each slice is split into IDs the
+    collection already holds, which are updated, and new IDs, which are
+    added directly; usually every ID is new and only add() runs.
+    """
+    for i in range(0, len(ids), UPSERT_BATCH_SIZE):
+        end = i + UPSERT_BATCH_SIZE
+        batch_ids = ids[i:end]
+        batch = {name: values[i:end] for name, values in fields.items() if values is not None}
+
+        existing = set(collection.get(ids=batch_ids, include=[])['ids'])
+        if not existing:
+            collection.add(ids=batch_ids, **batch)
+            continue
+
+        for write, keep in ((collection.update, True), (collection.add, False)):
+            idx = [j for j, id_ in enumerate(batch_ids) if (id_ in existing) == keep]
+            if idx:
+                write(
+                    ids=[batch_ids[j] for j in idx],
+                    **{name: values[idx] if isinstance(values, np.ndarray) else [values[j] for j in idx]
+                       for name, values in batch.items()}
+                )
 
 
 def mark_source_blocks_as_distilled(collection, source_block_ids, distill_task_uuid):
@@ -285,36 +456,30 @@ def mark_source_blocks_as_distilled(collection, source_block_ids, distill_task_u
     log(f"Marking {len(source_block_ids)} source blocks as distilled...")
 
     timestamp = datetime.utcnow().isoformat()
+    ids = list(source_block_ids)
+    marked = 0
 
-    # Get existing blocks to preserve their data
-    existing = collection.get(
-        ids=list(source_block_ids),
-        include=["metadatas", "documents", "embeddings"]
-    )
+    for i in range(0, len(ids), UPDATE_BATCH_SIZE):
+        # IDs only, to skip blocks that are no longer in the collection
+        batch = collection.get(ids=ids[i:i + UPDATE_BATCH_SIZE], include=[])['ids']
+        if not batch:
+            continue
+
+        # update() merges the flag into existing metadata without reading or
+        # rewriting documents and embeddings
+        collection.update(
+            ids=batch,
+            metadatas=[{'distilled': True, 'distilled_at': timestamp, 'distill_task': distill_task_uuid}
+                       for _ in batch]
+        )
+        marked += len(batch)
 
-    if not existing['ids']:
+    if not marked:
         log("No matching blocks found to mark", "WARNING")
         return 0
 
-    # Update metadata to mark as distilled
-    updated_metadatas = []
-    for meta in existing['metadatas']:
-        updated_meta = dict(meta)
-        updated_meta['distilled'] = True
-        updated_meta['distilled_at'] = timestamp
-        updated_meta['distill_task'] = distill_task_uuid
-        updated_metadatas.append(updated_meta)
-
-    # Upsert with updated metadata
-    collection.upsert(
-        ids=existing['ids'],
-        metadatas=updated_metadatas,
-        documents=existing['documents'] if existing.get('documents') else None,
-        embeddings=existing['embeddings'] if existing.get('embeddings') else None
-    )
-
-    log(f"Marked {len(existing['ids'])} blocks as distilled")
-    return len(existing['ids'])
+    log(f"Marked {marked} blocks as distilled")
+    return marked
 
 
 def import_results_to_chromadb(collection, results, source_task_uuid):
@@ -334,7 +499,11 @@ def import_results_to_chromadb(collection, results, source_task_uuid):
     documents = []
     metadatas = []
     all_source_ids = set()
-    timestamp = datetime.utcnow().isoformat()
+    base_metadata = {
+        'block_type': 'distilled',
+        'source_task': source_task_uuid,
+        'created_at': datetime.utcnow().isoformat()
+    }
 
     for block in merged_blocks:
         result = block.get('blockifiedTextResult', {})
@@ -348,21 +517,20 @@ def import_results_to_chromadb(collection, results, source_task_uuid):
         ids.append(block.get('blockifyResultUUID', str(uuid.uuid4())))
         documents.append(f"{name} {question} {answer}")
         metadatas.append({
+            **base_metadata,
             'name': name,
             'critical_question': question,
             'trusted_answer': answer,
-            'block_type': 'distilled',
-            'source_task': source_task_uuid,
             'source_blocks': json.dumps(source_ids),
-            'source_count': len(source_ids),
-            'created_at': timestamp
+            'source_count': len(source_ids)
         })
 
     log(f"Generating embeddings for {len(documents)} blocks...")
     embeddings = generate_embeddings(documents)
 
-    collection.upsert(
-        ids=ids,
+    upsert_in_batches(
+        collection,
+        ids,
         embeddings=embeddings,
         documents=documents,
         metadatas=metadatas
@@ -372,6 +540,16 @@ def import_results_to_chromadb(collection, results, source_task_uuid):
     return len(ids), all_source_ids
 
 
+def write_json(filepath, data):
+    """Write data as indented JSON, with orjson when it is installed."""
+    if _ORJSON_AVAILABLE:
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(filepath, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
 def save_results_to_file(results, stats, output_dir):
     """Save results to JSON file for backup."""
     os.makedirs(output_dir, exist_ok=True)
@@ -380,12 +558,11 @@ def save_results_to_file(results, stats, output_dir):
     filename = f"distillation_results_{timestamp}.json"
     filepath = os.path.join(output_dir, filename)
 
-    with open(filepath, 'w') as f:
-        json.dump({
-            'timestamp': timestamp,
-            'stats': stats,
-            'results': results
-        }, f, indent=2)
+    write_json(filepath, {
+        'timestamp': timestamp,
+        'stats': stats,
+        'results': results
+    })
 
     log(f"Results saved to {filepath}")
     return filepath
@@ -469,8 +646,7 @@ def run_distillation(
         os.makedirs(output_dir, exist_ok=True)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filepath = os.path.join(output_dir, f"export_{timestamp}.json")
-        with open(filepath, 'w') as f:
-            json.dump(blocks, f, indent=2)
+        write_json(filepath, blocks)
         log(f"Exported {len(blocks)} blocks to {filepath}")
         return True
 
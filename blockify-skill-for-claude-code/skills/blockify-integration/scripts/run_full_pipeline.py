@@ -25,40 +25,119 @@ Environment:
     DISTILL_SERVICE_URL - Distillation service URL (default: http://localhost:8315)
     IDEABLOCK_DATA_DIR - Data directory (default: ./data/ideablocks)
     BLOCKIFY_PARALLEL_WORKERS - Default parallel workers (default: 5)
+    BLOCKIFY_RPM - Blockify requests per minute budget (default: 60)
 """
 
+import io
 import os
 import sys
 import re
+import html
 import json
 import time
 import uuid
+import queue
 import hashlib
+import sqlite3
 import argparse
 import threading
 from datetime import datetime
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import chromadb
 from chromadb.config import Settings
 from openai import OpenAI
 
+try:
+    from lxml import etree
+    _LXML_AVAILABLE = True
+except ImportError:
+    _LXML_AVAILABLE = False
+
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
 # Configuration
 BLOCKIFY_API_KEY = os.environ.get('BLOCKIFY_API_KEY')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 DISTILL_SERVICE_URL = os.environ.get('DISTILL_SERVICE_URL', 'http://localhost:8315')
 DATA_DIR = os.environ.get('IDEABLOCK_DATA_DIR', './data/ideablocks')
 CHROMA_DIR = os.path.join(DATA_DIR, 'chroma_db')
+EMBEDDING_CACHE_PATH = os.path.join(DATA_DIR, 'embeddings_cache.sqlite')
 
 CHUNK_SIZE = 2000
 OVERLAP = 200
 EMBEDDING_MODEL = 'text-embedding-3-small'
 EMBEDDING_BATCH_SIZE = 100
-POLL_INTERVAL = 5
+EMBEDDING_WORKERS = 4  # Concurrent embedding requests
+UPSERT_BATCH_SIZE = 250
+UPDATE_BATCH_SIZE = 500
+MIN_POLL_INTERVAL = 1
+MAX_POLL_INTERVAL = 30
 MAX_POLL_TIME = 7200
+EXPORT_PAGE_SIZE = 10000  # Blocks fetched per ChromaDB get() during export
+STREAM_MIN_BLOCKS = 1000  # Larger distillation jobs stream their request body
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes per chunk of a streamed request body
+FILE_HASH_BLOCK_SIZE = 1 << 20  # Bytes read per step when hashing input files
+MAX_INFLIGHT_FILES = 4  # Files submitted per worker before waiting on one
+INGEST_QUEUE_SIZE = 8  # Parsed files waiting to be embedded and upserted
 PARALLEL_WORKERS = int(os.environ.get('BLOCKIFY_PARALLEL_WORKERS', '5'))
+BLOCKIFY_RPM = int(os.environ.get('BLOCKIFY_RPM', '60'))
+
+# Compiled once; the regex fallback runs these for every block of every response
+_IDEABLOCK_RE = re.compile(r'<ideablock>(.*?)</ideablock>', re.DOTALL)
+_ENTITY_RE = re.compile(r'<entity>(.*?)</entity>', re.DOTALL)
+_FIELD_PATTERNS = {
+    field: re.compile(f'<{field}>(.*?)</{field}>', re.DOTALL)
+    for field in ('name', 'critical_question', 'trusted_answer', 'tags',
+                  'keywords', 'entity_name', 'entity_type')
+}
+
+# Pooled keep-alive session. Blockify API calls are retried on 429/5xx with
+# exponential backoff. Distillation service GETs are retried only on gateway
+# errors; job submissions are never retried, so a job is not submitted twice,
+# and a refused connection is not retried, so the health check fails fast.
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=3,
+        connect=0,
+        backoff_factor=0.3,
+        status_forcelist=[502, 503, 504],
+        raise_on_status=False
+    )
+))
+_SESSION.mount('https://', _SESSION.get_adapter('http://'))
+
+
+def _mount_blockify_adapter(workers):
+    """(Re)mount the Blockify adapter with a pool big enough for workers."""
+    _SESSION.mount('https://api.blockify.ai/', HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=max(16, workers),
+        max_retries=Retry(
+            total=3,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['POST'],
+            raise_on_status=False
+        )
+    ))
+
+
+_mount_blockify_adapter(PARALLEL_WORKERS)
 
 # Thread-safe logging
 _log_lock = threading.Lock()
@@ -71,10 +150,44 @@ def log(message, level="INFO"):
         print(f"[{timestamp}] [{level}] {message}")
 
 
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` calls per `period` seconds."""
+
+    def __init__(self, rate, period=60.0):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / period
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call is allowed, then consume one token."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+# Shared by all worker threads, so the budget holds across files and chunks
+_blockify_limiter = RateLimiter(BLOCKIFY_RPM)
+
+
 # =============================================================================
 # ChromaDB Functions
 # =============================================================================
 
+@lru_cache(maxsize=None)
+def get_openai_client():
+    """Shared OpenAI client, so every embedding call reuses one connection pool."""
+    return OpenAI(api_key=OPENAI_API_KEY, max_retries=3)
+
+
 def get_chroma_client():
     """Get ChromaDB client."""
     os.makedirs(CHROMA_DIR, exist_ok=True)
@@ -98,21 +211,24 @@ def get_collection(client, collection_type='raw'):
 # =============================================================================
 
 def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP):
-    """Split text into overlapping chunks."""
-    sentences = text.replace('\n', ' ').split('. ')
-    chunks = []
+    """Split text into overlapping chunks.
+
+    Yields chunks lazily; each chunk is joined once and its tail is reused
+    as the overlap that starts the next one.
+    """
     current = []
     length = 0
 
-    for sentence in sentences:
+    for sentence in text.replace('\n', ' ').split('. '):
         sentence = sentence.strip()
         if not sentence:
             continue
         sentence += '. '
 
         if length + len(sentence) > chunk_size and current:
-            chunks.append(''.join(current))
-            overlap_text = ''.join(current)[-overlap:]
+            chunk = ''.join(current)
+            yield chunk
+            overlap_text = chunk[-overlap:]
             current = [overlap_text, sentence]
             length = len(overlap_text) + len(sentence)
         else:
@@ -120,79 +236,138 @@ def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP):
             length += len(sentence)
 
     if current:
-        chunks.append(''.join(current))
+        yield ''.join(current)
 
-    return chunks
 
+def call_blockify(chunk):
+    """Call Blockify Ingest API (the session retries rate limits and server errors)."""
+    _blockify_limiter.acquire()
+    try:
+        response = _SESSION.post(
+            'https://api.blockify.ai/v1/chat/completions',
+            headers={
+                'Authorization': f'Bearer {BLOCKIFY_API_KEY}',
+                'Content-Type': 'application/json'
+            },
+            json={
+                'model': 'ingest',
+                'messages': [{'role': 'user', 'content': chunk}],
+                'max_tokens': 8000,
+                'temperature': 0.5
+            },
+            timeout=60
+        )
+    except requests.exceptions.RequestException as e:
+        log(f"Blockify API exception: {e}", "WARNING")
+        return None
 
-def call_blockify(chunk, retries=3):
-    """Call Blockify Ingest API."""
-    for attempt in range(retries):
-        try:
-            response = requests.post(
-                'https://api.blockify.ai/v1/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {BLOCKIFY_API_KEY}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'ingest',
-                    'messages': [{'role': 'user', 'content': chunk}],
-                    'max_tokens': 8000,
-                    'temperature': 0.5
-                },
-                timeout=60
-            )
-
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content']
-            elif response.status_code == 429:
-                time.sleep(2 ** attempt)
-            else:
-                log(f"Blockify API error: {response.status_code}", "WARNING")
-                return None
-        except Exception as e:
-            log(f"Blockify API exception: {e}", "WARNING")
-            time.sleep(2)
+    if response.status_code == 200:
+        return response.json()['choices'][0]['message']['content']
 
+    log(f"Blockify API error: {response.status_code}", "WARNING")
     return None
 
 
 def extract_field(xml, field):
-    """Extract field from XML."""
-    match = re.search(f'<{field}>(.*?)</{field}>', xml, re.DOTALL)
-    return match.group(1).strip() if match else ''
+    """Extract field from XML (entity references are decoded, as lxml does)."""
+    match = _FIELD_PATTERNS[field].search(xml)
+    return html.unescape(match.group(1).strip()) if match else ''
+
+
+def _extract_blocks_regex(content):
+    """Pull IdeaBlock fields out of the response with regular expressions."""
+    blocks = []
+    for block in _IDEABLOCK_RE.findall(content):
+        blocks.append({
+            'name': extract_field(block, 'name'),
+            'critical_question': extract_field(block, 'critical_question'),
+            'trusted_answer': extract_field(block, 'trusted_answer'),
+            'tags': extract_field(block, 'tags'),
+            'keywords': extract_field(block, 'keywords'),
+            'entities': [
+                {'name': extract_field(entity, 'entity_name'),
+                 'type': extract_field(entity, 'entity_type')}
+                for entity in _ENTITY_RE.findall(block)
+            ]
+        })
+    return blocks
+
+
+class _MixedContent(Exception):
+    """A field holds child elements, whose markup only the regex path keeps."""
+
+
+def _extract_blocks_lxml(content):
+    """Pull IdeaBlock fields out of the response in one lxml pass.
+
+    Raises etree.XMLSyntaxError if the response is not well-formed, and
+    _MixedContent if a field has child elements (e.g. inline <b> markup).
+    """
+    def text(elem, path):
+        field = elem.find(path)
+        if field is None:
+            return ''
+        if len(field):
+            raise _MixedContent(path)
+        return (field.text or '').strip()
+
+    source = io.BytesIO(b'<root>' + content.encode() + b'</root>')
+    blocks = []
+    for _, elem in etree.iterparse(source, events=('end',), tag='ideablock'):
+        blocks.append({
+            'name': text(elem, './/name'),
+            'critical_question': text(elem, './/critical_question'),
+            'trusted_answer': text(elem, './/trusted_answer'),
+            'tags': text(elem, './/tags'),
+            'keywords': text(elem, './/keywords'),
+            'entities': [
+                {'name': text(entity, './/entity_name'),
+                 'type': text(entity, './/entity_type')}
+                for entity in elem.iter('entity')
+            ]
+        })
+        elem.clear()
+    return blocks
 
 
 def parse_ideablocks(content):
-    """Parse IdeaBlocks from API response."""
-    blocks = re.findall(r'<ideablock>(.*?)</ideablock>', content, re.DOTALL)
+    """Parse IdeaBlocks from API response.
+
+    Uses lxml when it is installed and the response is well-formed XML,
+    otherwise falls back to regular expressions; so does a response with
+    markup inside a field, which only the regex path keeps intact.
+    """
+    blocks = None
+    if _LXML_AVAILABLE:
+        try:
+            blocks = _extract_blocks_lxml(content)
+        except (etree.XMLSyntaxError, _MixedContent):
+            pass
+    if blocks is None:
+        blocks = _extract_blocks_regex(content)
+
     parsed = []
 
     for block in blocks:
-        name = extract_field(block, 'name')
-        question = extract_field(block, 'critical_question')
-        answer = extract_field(block, 'trusted_answer')
+        name = block['name']
+        question = block['critical_question']
+        answer = block['trusted_answer']
 
         if not all([name, question, answer]):
             continue
 
-        content_hash = hashlib.sha256(f"{name}{question}{answer}".encode()).hexdigest()[:16]
+        content_hash = hashlib.blake2b(f"{name}{question}{answer}".encode(), digest_size=8).hexdigest()
 
-        entities = []
-        for entity in re.findall(r'<entity>(.*?)</entity>', block, re.DOTALL):
-            entities.append({
-                'name': extract_field(entity, 'entity_name'),
-                'type': extract_field(entity, 'entity_type')
-            })
+        entities = block['entities']
 
         parsed.append({
             'id': f"ib_{content_hash}",
             'name': name,
             'critical_question': question,
             'trusted_answer': answer,
-            'tags': extract_field(block, 'tags'),
-            'keywords': extract_field(block, 'keywords'),
+            'doc_text': f"{name} {question} {answer}",
+            'tags': block['tags'],
+            'keywords': block['keywords'],
             'entities': entities,
             'primary_entity': entities[0]['name'] if entities else '',
             'primary_entity_type': entities[0]['type'] if entities else ''
@@ -201,71 +376,223 @@ def parse_ideablocks(content):
     return parsed
 
 
+def _embedding_key(text):
+    """Content hash used as the embedding cache key (scoped to the model)."""
+    return hashlib.blake2b(f"{EMBEDDING_MODEL}\0{text}".encode(), digest_size=16).hexdigest()
+
+
+def _open_embedding_cache():
+    """Open the on-disk embedding cache, creating it if needed."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(EMBEDDING_CACHE_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vec BLOB)")
+    return conn
+
+
 def generate_embeddings(texts):
-    """Generate embeddings using OpenAI."""
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    embeddings = []
+    """Generate embeddings using OpenAI.
+
+    Vectors are cached as float32 blobs keyed by content hash, so only
+    texts that have never been embedded before are sent to the API; those
+    batches are sent concurrently. Returns one (len(texts), dim) float32
+    array, which ChromaDB accepts as-is.
+    """
+    keys = [_embedding_key(t) for t in texts]
+    conn = _open_embedding_cache()
+
+    try:
+        # Look up cached vectors (chunked to stay under SQLite's variable limit)
+        vectors = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), 500):
+            batch = unique_keys[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(
+                f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", batch
+            )
+            for key, blob in rows:
+                vectors[key] = np.frombuffer(blob, dtype=np.float32)
+
+        missing = {k: t for k, t in zip(keys, texts) if k not in vectors}
+        log(f"Embedding cache: {len(unique_keys) - len(missing)} hits, {len(missing)} to embed")
+
+        if missing:
+            client = get_openai_client()
+            missing_keys = list(missing)
+            missing_texts = list(missing.values())
+
+            batches = [missing_texts[i:i + EMBEDDING_BATCH_SIZE]
+                       for i in range(0, len(missing_texts), EMBEDDING_BATCH_SIZE)]
+
+            # Batches are independent; the pool size caps in-flight requests
+            with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor:
+                responses = executor.map(
+                    lambda batch: client.embeddings.create(model=EMBEDDING_MODEL, input=batch),
+                    batches
+                )
+                items = [item for response in responses for item in response.data]
 
-    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
-        batch = texts[i:i + EMBEDDING_BATCH_SIZE]
-        response = client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
-        embeddings.extend([item.embedding for item in response.data])
+            for key, item in zip(missing_keys, items):
+                vectors[key] = np.asarray(item.embedding, dtype=np.float32)
 
-    return embeddings
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                    [(k, vectors[k].tobytes()) for k in missing_keys]
+                )
+    finally:
+        conn.close()
 
+    return np.vstack([vectors[k] for k in keys])
 
-def ingest_blocks_to_collection(blocks, collection, source_document):
-    """Ingest parsed blocks to ChromaDB."""
+
+def _json_dumps(obj):
+    """Serialize a metadata value to a compact JSON string.
+
+    The stdlib fallback uses orjson's separators so stored metadata is the
+    same whichever encoder is installed.
+    """
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+
+def upsert_in_batches(collection, ids, **fields):
+    """Upsert in UPSERT_BATCH_SIZE slices so no single call is oversized.
+
+    ``fields`` are the parallel embeddings/documents/metadatas lists; None
+    values are left out of the call. Each slice is split into IDs the
+    collection already holds, which are updated, and new IDs, which are
+    added directly; usually every ID is new and only add() runs.
+
+    Returns:
+        Number of IDs that were new to the collection
+    """
+    added = 0
+    for i in range(0, len(ids), UPSERT_BATCH_SIZE):
+        end = i + UPSERT_BATCH_SIZE
+        batch_ids = ids[i:end]
+        batch = {name: values[i:end] for name, values in fields.items() if values is not None}
+
+        existing = set(collection.get(ids=batch_ids, include=[])['ids'])
+        added += len(batch_ids) - len(existing)
+        if not existing:
+            collection.add(ids=batch_ids, **batch)
+            continue
+
+        for write, keep in ((collection.update, True), (collection.add, False)):
+            idx = [j for j, id_ in enumerate(batch_ids) if (id_ in existing) == keep]
+            if idx:
+                write(
+                    ids=[batch_ids[j] for j in idx],
+                    **{name: values[idx] if isinstance(values, np.ndarray) else [values[j] for j in idx]
+                       for name, values in batch.items()}
+                )
+    return added
+
+
+def ingest_blocks_to_collection(blocks, collection, source_document, file_digest=None):
+    """Ingest parsed blocks to ChromaDB.
+
+    ``file_digest`` (see _file_digest) is stamped on every block once all of
+    them are stored, so a later run can tell the source file has not changed
+    and a file that failed part-way is never mistaken for a finished one.
+
+    Returns:
+        Number of blocks that were not already in the collection
+    """
     if not blocks:
         return 0
 
     ids = []
     documents = []
     metadatas = []
-    timestamp = datetime.utcnow().isoformat()
+    # Fields shared by every block from this file, built once
+    base_metadata = {
+        'source_document': source_document,
+        'block_type': 'raw',
+        'distilled': False,
+        'created_at': datetime.utcnow().isoformat()
+    }
 
     for block in blocks:
         ids.append(block['id'])
-        documents.append(f"{block['name']} {block['critical_question']} {block['trusted_answer']}")
+        documents.append(block['doc_text'])
         metadatas.append({
+            **base_metadata,
             'name': block['name'],
             'critical_question': block['critical_question'],
             'trusted_answer': block['trusted_answer'],
             'tags': block['tags'],
             'keywords': block['keywords'],
-            'entities': json.dumps(block['entities']),
+            'entities': _json_dumps(block['entities']),
+            'entity_names': '|'.join(e['name'] for e in block['entities']),
             'primary_entity': block['primary_entity'],
-            'primary_entity_type': block['primary_entity_type'],
-            'source_document': source_document,
-            'block_type': 'raw',
-            'distilled': False,
-            'created_at': timestamp
+            'primary_entity_type': block['primary_entity_type']
         })
 
     log(f"Generating embeddings for {len(documents)} blocks...")
     embeddings = generate_embeddings(documents)
 
-    collection.upsert(
-        ids=ids,
+    added = upsert_in_batches(
+        collection,
+        ids,
         embeddings=embeddings,
         documents=documents,
         metadatas=metadatas
     )
 
-    return len(blocks)
+    if file_digest:
+        stamp = {'file_digest': file_digest}
+        for i in range(0, len(ids), UPSERT_BATCH_SIZE):
+            batch_ids = ids[i:i + UPSERT_BATCH_SIZE]
+            collection.update(ids=batch_ids, metadatas=[stamp] * len(batch_ids))
+
+    return added
+
+
+def _file_digest(filepath):
+    """Content hash of a file, read in FILE_HASH_BLOCK_SIZE steps."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(FILE_HASH_BLOCK_SIZE), b''):
+            h.update(block)
+    return h.hexdigest()
+
 
+def process_file(filepath, collection, block_queue, chunk_pool, slots, parallel=False):
+    """Process a single file through Blockify and queue its blocks for ingestion.
 
-def process_file(filepath, collection, parallel=False):
-    """Process a single file through Blockify to ChromaDB.
+    Files whose blocks are already in the collection with the same content
+    digest are skipped without calling Blockify.
 
     Args:
         filepath: Path to the file to process
-        collection: ChromaDB collection to ingest into
+        collection: ChromaDB collection checked for an earlier ingest
+        block_queue: Queue drained by ingest_worker; receives
+            (blocks, source, file_digest)
+        chunk_pool: Executor shared by all files that runs the Blockify
+            calls, so concurrency stays at its worker count
+        slots: Semaphore capping how many chunk calls may be queued or
+            running at once across files
         parallel: If True, include filename prefix in logs for clarity
+
+    Returns:
+        Number of blocks queued
     """
     filename = os.path.basename(filepath)
     prefix = f"[{filename}] " if parallel else ""
 
+    digest = _file_digest(filepath)
+    already_ingested = collection.get(
+        where={"$and": [{"source_document": filename}, {"file_digest": digest}]},
+        limit=1,
+        include=[]
+    )['ids']
+    if already_ingested:
+        log(f"{prefix}Skipping {filepath}: unchanged since last ingest")
+        return 0
+
     log(f"{prefix}Processing {filepath}...")
 
     with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
@@ -273,28 +600,75 @@ def process_file(filepath, collection, parallel=False):
 
     log(f"{prefix}{len(text)} characters")
 
-    chunks = chunk_text(text)
+    chunks = list(chunk_text(text))
     log(f"{prefix}Split into {len(chunks)} chunks")
 
+    # Chunks go to the shared pool as soon as a slot is free; results are
+    # consumed in chunk order
+    futures = []
+    for chunk in chunks:
+        slots.acquire()
+        future = chunk_pool.submit(call_blockify, chunk)
+        future.add_done_callback(lambda _: slots.release())
+        futures.append(future)
+
     all_blocks = []
-    for i, chunk in enumerate(chunks):
-        log(f"{prefix}Chunk {i+1}/{len(chunks)}...")
-        content = call_blockify(chunk)
+    failed = 0
+    for i, future in enumerate(futures):
+        content = future.result()
         if content:
             blocks = parse_ideablocks(content)
             all_blocks.extend(blocks)
-            log(f"{prefix}  -> {len(blocks)} blocks")
+            log(f"{prefix}Chunk {i+1}/{len(chunks)}: {len(blocks)} blocks")
         else:
-            log(f"{prefix}  -> failed", "WARNING")
-        time.sleep(0.5)
+            log(f"{prefix}Chunk {i+1}/{len(chunks)}: failed", "WARNING")
+            failed += 1
 
     if all_blocks:
-        source = filename
-        count = ingest_blocks_to_collection(all_blocks, collection, source)
-        log(f"{prefix}Ingested {count} blocks to ChromaDB")
-        return count
+        # Only record the digest once every chunk succeeded, so a file with
+        # failed chunks is sent to Blockify again on the next run
+        # (put() blocks while the queue is full, so memory stays bounded)
+        block_queue.put((all_blocks, filename, None if failed else digest))
 
-    return 0
+    return len(all_blocks)
+
+
+def _check_file_result(future, filepath):
+    """Log the error, if any, raised by a process_file future."""
+    try:
+        future.result()
+    except Exception as e:
+        log(f"Error processing {filepath}: {e}", "ERROR")
+
+
+def ingest_worker(block_queue, collection):
+    """Embed and upsert queued blocks until a None sentinel arrives.
+
+    Runs on its own thread, so one file's embeddings and ChromaDB writes
+    overlap with the Blockify calls for the files after it.
+
+    Returns:
+        tuple: (blocks ingested, blocks new to the collection); the second
+        is None if a file failed part-way, as some of its writes may
+        still have landed
+    """
+    total = 0
+    added = 0
+    while True:
+        item = block_queue.get()
+        if item is None:
+            return total, added
+
+        blocks, source, file_digest = item
+        try:
+            new_count = ingest_blocks_to_collection(blocks, collection, source, file_digest)
+            total += len(blocks)
+            if added is not None:
+                added += new_count
+            log(f"[{source}] Ingested {len(blocks)} blocks to ChromaDB")
+        except Exception as e:
+            added = None
+            log(f"Error ingesting {source}: {e}", "ERROR")
 
 
 # =============================================================================
@@ -304,7 +678,7 @@ def process_file(filepath, collection, parallel=False):
 def check_distillation_service(service_url):
     """Check if distillation service is healthy."""
     try:
-        response = requests.get(f"{service_url}/health", timeout=10)
+        response = _SESSION.get(f"{service_url}/health", timeout=10)
         if response.status_code == 200:
             return True, response.json()
         return False, f"Status {response.status_code}"
@@ -314,43 +688,73 @@ def check_distillation_service(service_url):
         return False, str(e)
 
 
-def export_blocks_for_distillation(collection, only_active=True):
-    """Export blocks from ChromaDB for distillation."""
-    count = collection.count()
-    if count == 0:
-        return []
+def _export_block(doc_id, metadata):
+    """One stored block in the distillation service's format."""
+    block = {
+        "type": "blockify",
+        "blockifyResultUUID": doc_id,
+        "blockifiedTextResult": {
+            "name": metadata.get('name', ''),
+            "criticalQuestion": metadata.get('critical_question', ''),
+            "trustedAnswer": metadata.get('trusted_answer', '')
+        },
+        "hidden": False,
+        "exported": False,
+        "reviewed": False
+    }
+
+    source_document = metadata.get('source_document')
+    if source_document:
+        block["blockifyDocumentUUID"] = source_document
 
-    results = collection.get(
-        limit=count,
-        include=["metadatas", "documents"]
-    )
+    return block
 
-    blocks = []
-    for i, doc_id in enumerate(results['ids']):
-        metadata = results['metadatas'][i]
 
-        if only_active and metadata.get('distilled', False):
-            continue
+def iter_blocks_for_distillation(collection, only_active=True, batch=EXPORT_PAGE_SIZE):
+    """Yield blocks from ChromaDB in the distillation service's format.
 
-        block = {
-            "type": "blockify",
-            "blockifyResultUUID": doc_id,
-            "blockifiedTextResult": {
-                "name": metadata.get('name', ''),
-                "criticalQuestion": metadata.get('critical_question', ''),
-                "trustedAnswer": metadata.get('trusted_answer', '')
-            },
-            "hidden": False,
-            "exported": False,
-            "reviewed": False
-        }
+    Blocks are read ``batch`` at a time, metadata only, so at most one page
+    of ChromaDB results is held in memory.
+    """
+    # ChromaDB filters out distilled blocks; $ne also matches blocks that
+    # were never flagged
+    where = {"distilled": {"$ne": True}} if only_active else None
+
+    offset = 0
+    while True:
+        results = collection.get(
+            where=where,
+            limit=batch,
+            offset=offset,
+            include=["metadatas"]
+        )
+        if not results['ids']:
+            break
+        offset += len(results['ids'])
 
-        if metadata.get('source_document'):
-            block["blockifyDocumentUUID"] = metadata.get('source_document')
+        yield from map(_export_block, results['ids'], results['metadatas'])
 
-        blocks.append(block)
 
-    return blocks
+_STREAM_ENCODER = json.JSONEncoder(separators=(',', ':'))
+
+
+def _iter_json_body(payload):
+    """Yield payload as compact JSON in roughly STREAM_CHUNK_SIZE byte pieces.
+
+    iterencode produces one small string per token, so they are joined
+    into larger chunks before going on the wire.
+    """
+    parts = []
+    size = 0
+    for part in _STREAM_ENCODER.iterencode(payload):
+        parts.append(part)
+        size += len(part)
+        if size >= STREAM_CHUNK_SIZE:
+            yield ''.join(parts).encode('utf-8')
+            parts.clear()
+            size = 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
 
 
 def submit_distillation_job(service_url, blocks, similarity, iterations):
@@ -365,11 +769,17 @@ def submit_distillation_job(service_url, blocks, similarity, iterations):
     }
 
     try:
-        response = requests.post(
+        if len(blocks) > STREAM_MIN_BLOCKS:
+            # A generator body is sent with chunked transfer encoding, so
+            # the whole payload is never held as one string
+            body = {'data': _iter_json_body(payload), 'timeout': (10, 300)}
+        else:
+            body = {'json': payload, 'timeout': 60}
+
+        response = _SESSION.post(
             f"{service_url}/api/autoDistill",
-            json=payload,
             headers={"Content-Type": "application/json"},
-            timeout=60
+            **body
         )
         response.raise_for_status()
 
@@ -381,41 +791,154 @@ def submit_distillation_job(service_url, blocks, similarity, iterations):
         return None, None
 
 
+def next_poll_interval(interval, percent):
+    """Back off exponentially while a job runs, tightening near completion.
+
+    The wait doubles up to MAX_POLL_INTERVAL but never exceeds that cap
+    scaled by the fraction of work left, so polls speed back up towards
+    MIN_POLL_INTERVAL as progress approaches 100%.
+    """
+    remaining = max(0.0, 1 - percent / 100)
+    return max(MIN_POLL_INTERVAL, min(interval * 2, MAX_POLL_INTERVAL * remaining))
+
+
+def _server_poll_delay(response, data=None):
+    """Wait the service asked for before the next poll, or None.
+
+    A Retry-After header (in seconds) wins, capped at MAX_POLL_INTERVAL;
+    otherwise a progress ETA of more than 2s means polling again a quarter
+    of the way there, up to 10s. Either way the wait is at least
+    MIN_POLL_INTERVAL.
+    """
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return max(MIN_POLL_INTERVAL, min(int(retry_after), MAX_POLL_INTERVAL))
+
+    eta = ((data or {}).get('progress') or {}).get('eta_seconds')
+    if isinstance(eta, (int, float)) and eta > 2:
+        return max(MIN_POLL_INTERVAL, min(eta / 4, 10))
+    return None
+
+
+def _stream_job_events(service_url, job_id, deadline):
+    """Yield job status documents from the service's Server-Sent Events stream.
+
+    Each event carries the same JSON as GET /api/jobs/{job_id}. Stops once
+    ``deadline`` (a time.time() value) passes. Raises requests.HTTPError if
+    the service has no event stream (older services answer 404).
+    """
+    with _SESSION.get(
+        f"{service_url}/api/jobs/{job_id}/events",
+        headers={"Accept": "text/event-stream"},
+        stream=True,
+        timeout=(10, 60)  # The service sends a keep-alive comment every 15s
+    ) as response:
+        response.raise_for_status()
+
+        data_lines = []
+        for raw in response.iter_lines():
+            if time.time() >= deadline:
+                return
+
+            line = raw.decode('utf-8')
+            if line.startswith('data:'):
+                data_lines.append(line[5:].lstrip(' '))
+            elif not line and data_lines:
+                # A blank line ends the event
+                yield json.loads('\n'.join(data_lines))
+                data_lines = []
+
+
+def _log_job_progress(data, last_progress):
+    """Log a running job's progress when it changes; returns the latest value."""
+    progress = data.get('progress')
+    if data.get('status') != 'running' or not progress:
+        return last_progress
+
+    progress_str = f"{progress.get('percent', 0):.1f}%"
+    if progress_str != last_progress:
+        log(f"  Distillation progress: {progress_str}")
+    return progress_str
+
+
+def _job_outcome(data):
+    """Result to return for a finished job, logging failures."""
+    if data.get('status') == 'success':
+        return data
+    log(f"Distillation {data.get('status')}: {data.get('error', 'Unknown')}", "ERROR")
+    return data if data.get('intermediate_result') else None
+
+
 def poll_distillation_job(service_url, job_id):
-    """Poll for job completion."""
+    """Wait for job completion.
+
+    Follows the job's event stream, so updates arrive as they happen over
+    one connection; falls back to polling GET /api/jobs/{job_id} if the
+    service has no stream or the stream drops.
+    """
     start_time = time.time()
     last_progress = None
 
+    try:
+        for data in _stream_job_events(service_url, job_id, start_time + MAX_POLL_TIME):
+            last_progress = _log_job_progress(data, last_progress)
+            if data.get('status') in ['success', 'failure', 'timeout']:
+                return _job_outcome(data)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log(f"Job event stream unavailable ({e}), polling instead")
+
+    interval = MIN_POLL_INTERVAL
+
     while time.time() - start_time < MAX_POLL_TIME:
         try:
-            response = requests.get(f"{service_url}/api/jobs/{job_id}", timeout=30)
+            response = _SESSION.get(f"{service_url}/api/jobs/{job_id}", timeout=30)
             response.raise_for_status()
             data = response.json()
 
-            status = data.get('status')
-
-            if status == 'running' and 'progress' in data:
-                progress = data['progress']
-                progress_str = f"{progress.get('percent', 0):.1f}%"
-                if progress_str != last_progress:
-                    log(f"  Distillation progress: {progress_str}")
-                    last_progress = progress_str
+            progress_str = _log_job_progress(data, last_progress)
+            if progress_str != last_progress:
+                last_progress = progress_str
+                # The job is moving again; check back soon
+                interval = MIN_POLL_INTERVAL
 
-            if status == 'success':
-                return data
-            elif status in ['failure', 'timeout']:
-                log(f"Distillation {status}: {data.get('error', 'Unknown')}", "ERROR")
-                return data if data.get('intermediate_result') else None
+            if data.get('status') in ['success', 'failure', 'timeout']:
+                return _job_outcome(data)
 
-            time.sleep(POLL_INTERVAL)
+            # A wait suggested by the service overrides the backoff
+            delay = _server_poll_delay(response, data)
+            time.sleep(interval if delay is None else delay)
+            interval = next_poll_interval(interval, (data.get('progress') or {}).get('percent', 0))
 
         except Exception as e:
             log(f"Poll error: {e}", "WARNING")
-            time.sleep(POLL_INTERVAL * 2)
+            delay = _server_poll_delay(getattr(e, 'response', None))
+            time.sleep(interval if delay is None else delay)
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
 
     return None
 
 
+def mark_source_blocks_as_distilled(collection, source_ids, task_uuid, timestamp):
+    """Flag source blocks as distilled; returns the IDs that were marked.
+
+    update() merges the flag into existing metadata without reading or
+    rewriting documents and embeddings.
+    """
+    marked = []
+    for i in range(0, len(source_ids), UPDATE_BATCH_SIZE):
+        # IDs only, to skip blocks that are no longer in the collection
+        batch = collection.get(ids=source_ids[i:i + UPDATE_BATCH_SIZE], include=[])['ids']
+        if batch:
+            collection.update(
+                ids=batch,
+                metadatas=[{'distilled': True, 'distilled_at': timestamp, 'distill_task': task_uuid}
+                           for _ in batch]
+            )
+            marked.extend(batch)
+    return marked
+
+
 def import_distillation_results(target_collection, source_collection, results, task_uuid):
     """Import distillation results and mark source blocks."""
     merged_blocks = [
@@ -430,67 +953,59 @@ def import_distillation_results(target_collection, source_collection, results, t
     ids = []
     documents = []
     metadatas = []
-    all_source_ids = set()
+    source_id_lists = [block.get('blockifyResultsUsed', []) for block in merged_blocks]
     timestamp = datetime.utcnow().isoformat()
+    base_metadata = {'block_type': 'distilled', 'source_task': task_uuid, 'created_at': timestamp}
 
-    for block in merged_blocks:
+    for block, source_ids in zip(merged_blocks, source_id_lists):
         result = block.get('blockifiedTextResult', {})
         name = result.get('name', '')
         question = result.get('criticalQuestion', '')
         answer = result.get('trustedAnswer', '')
 
-        source_ids = block.get('blockifyResultsUsed', [])
-        all_source_ids.update(source_ids)
-
         ids.append(block.get('blockifyResultUUID', str(uuid.uuid4())))
         documents.append(f"{name} {question} {answer}")
         metadatas.append({
+            **base_metadata,
             'name': name,
             'critical_question': question,
             'trusted_answer': answer,
-            'block_type': 'distilled',
-            'source_task': task_uuid,
-            'source_blocks': json.dumps(source_ids),
-            'source_count': len(source_ids),
-            'created_at': timestamp
+            'source_blocks': _json_dumps(source_ids),
+            'source_count': len(source_ids)
         })
 
+    all_source_ids = set(chain.from_iterable(source_id_lists))
+
     log(f"Generating embeddings for {len(documents)} merged blocks...")
     embeddings = generate_embeddings(documents)
 
-    target_collection.upsert(
-        ids=ids,
-        embeddings=embeddings,
-        documents=documents,
-        metadatas=metadatas
-    )
-
-    # Mark source blocks as distilled
-    marked_count = 0
-    if all_source_ids:
-        existing = source_collection.get(
-            ids=list(all_source_ids),
-            include=["metadatas", "documents", "embeddings"]
+    # The two writes touch different collections, so they run side by side
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        upsert_future = executor.submit(
+            upsert_in_batches,
+            target_collection,
+            ids,
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=metadatas
+        )
+        mark_future = executor.submit(
+            mark_source_blocks_as_distilled,
+            source_collection, list(all_source_ids), task_uuid, timestamp
         )
 
-        if existing['ids']:
-            updated_metadatas = []
-            for meta in existing['metadatas']:
-                updated_meta = dict(meta)
-                updated_meta['distilled'] = True
-                updated_meta['distilled_at'] = timestamp
-                updated_meta['distill_task'] = task_uuid
-                updated_metadatas.append(updated_meta)
-
-            source_collection.upsert(
-                ids=existing['ids'],
-                metadatas=updated_metadatas,
-                documents=existing.get('documents'),
-                embeddings=existing.get('embeddings')
-            )
-            marked_count = len(existing['ids'])
+        marked = mark_future.result()
+        try:
+            upsert_future.result()
+        except Exception:
+            # Don't leave source blocks hidden without the merged blocks
+            # that were meant to replace them
+            for i in range(0, len(marked), UPDATE_BATCH_SIZE):
+                batch = marked[i:i + UPDATE_BATCH_SIZE]
+                source_collection.update(ids=batch, metadatas=[{'distilled': False} for _ in batch])
+            raise
 
-    return len(ids), marked_count
+    return len(ids), len(marked)
 
 
 # =============================================================================
@@ -567,58 +1082,84 @@ def run_full_pipeline(
     log("=" * 70)
 
     input_path = Path(input_path)
-    files_to_process = []
 
+    # Files are handed out as the directory walk finds them, rather than
+    # after the whole tree has been listed
     if input_path.is_file():
-        files_to_process.append(input_path)
+        files_to_process = iter([input_path])
     elif input_path.is_dir():
-        for ext in file_extensions:
-            files_to_process.extend(input_path.glob(f'**/*{ext}'))
+        files_to_process = (fp for ext in file_extensions for fp in input_path.rglob(f'*{ext}'))
     else:
         log(f"Input path not found: {input_path}", "ERROR")
         return False
 
-    if not files_to_process:
+    log(f"Processing files with {parallel_workers} worker(s)")
+    file_count = 0
+
+    # Files are sent to Blockify by the producers below while a single
+    # consumer thread embeds and upserts whatever they have finished. All
+    # files share one chunk pool, so at most parallel_workers Blockify calls
+    # run at once however many files are in flight
+    _mount_blockify_adapter(parallel_workers)
+    slots = threading.BoundedSemaphore(parallel_workers * 2)
+    block_queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    with ThreadPoolExecutor(max_workers=1) as consumer, \
+            ThreadPoolExecutor(max_workers=parallel_workers) as chunk_pool:
+        ingest_future = consumer.submit(ingest_worker, block_queue, raw_collection)
+
+        try:
+            if parallel_workers > 1:
+                # Parallel processing; at most MAX_INFLIGHT_FILES per worker
+                # are submitted before waiting for one to finish
+                with ThreadPoolExecutor(max_workers=parallel_workers) as executor:
+                    futures = {}
+                    for fp in files_to_process:
+                        file_count += 1
+                        futures[executor.submit(
+                            process_file, str(fp), raw_collection, block_queue, chunk_pool, slots, True
+                        )] = fp
+
+                        if len(futures) >= parallel_workers * MAX_INFLIGHT_FILES:
+                            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                _check_file_result(future, futures.pop(future))
+
+                    for future in as_completed(futures):
+                        _check_file_result(future, futures[future])
+            else:
+                # Sequential processing
+                for filepath in files_to_process:
+                    file_count += 1
+                    try:
+                        process_file(str(filepath), raw_collection, block_queue, chunk_pool, slots, parallel=False)
+                    except Exception as e:
+                        log(f"Error processing {filepath}: {e}", "ERROR")
+        finally:
+            block_queue.put(None)
+
+        total_ingested, total_added = ingest_future.result()
+
+    if not file_count:
         log(f"No files found with extensions {file_extensions}", "ERROR")
         return False
 
-    log(f"Found {len(files_to_process)} files to process with {parallel_workers} worker(s)")
-
-    total_ingested = 0
-    if parallel_workers > 1:
-        # Parallel processing
-        with ThreadPoolExecutor(max_workers=parallel_workers) as executor:
-            futures = {
-                executor.submit(process_file, str(fp), raw_collection, True): fp
-                for fp in files_to_process
-            }
-            for future in as_completed(futures):
-                filepath = futures[future]
-                try:
-                    count = future.result()
-                    total_ingested += count
-                except Exception as e:
-                    log(f"Error processing {filepath}: {e}", "ERROR")
+    # Ingestion only adds or updates blocks, so the new count is known
+    # unless a failed file may have written some blocks uncounted
+    if total_added is None:
+        final_raw_count = raw_collection.count()
     else:
-        # Sequential processing
-        for filepath in files_to_process:
-            try:
-                count = process_file(str(filepath), raw_collection, parallel=False)
-                total_ingested += count
-            except Exception as e:
-                log(f"Error processing {filepath}: {e}", "ERROR")
-
-    final_raw_count = raw_collection.count()
+        final_raw_count = initial_raw_count + total_added
 
     log("")
     log(f"Ingestion complete:")
-    log(f"  Files processed: {len(files_to_process)}")
+    log(f"  Files processed: {file_count}")
     log(f"  Blocks created: {total_ingested}")
     log(f"  Raw collection: {final_raw_count} blocks")
 
     # Phase 2: Distillation
     imported_count = 0
     marked_count = 0
+    active_count = None  # Known without a query once distillation has run
 
     if distill_available and not skip_distillation and final_raw_count >= 2:
         log("")
@@ -627,7 +1168,7 @@ def run_full_pipeline(
         log("=" * 70)
 
         # Export active blocks
-        blocks = export_blocks_for_distillation(raw_collection, only_active=True)
+        blocks = list(iter_blocks_for_distillation(raw_collection, only_active=True))
         log(f"Exported {len(blocks)} active blocks for distillation")
 
         if len(blocks) >= 2:
@@ -657,6 +1198,8 @@ def run_full_pipeline(
                     )
                     log(f"Imported {imported_count} merged blocks")
                     log(f"Marked {marked_count} source blocks as distilled")
+                    # Every marked block was one of the exported active blocks
+                    active_count = len(blocks) - marked_count
                 else:
                     log("Distillation failed", "ERROR")
             else:
@@ -727,17 +1270,21 @@ def run_full_pipeline(
     log("=" * 70)
 
     # Count actual active blocks
-    raw_total = raw_collection.count()
-    try:
-        active_results = raw_collection.get(
-            limit=raw_total,
-            where={"distilled": {"$eq": False}},
-            include=[]
-        )
-        active_count = len(active_results['ids']) if active_results['ids'] else 0
-    except Exception:
-        # Fallback: count all and subtract marked
-        active_count = raw_total - marked_count
+    # Distillation only flags raw blocks, so the raw count is unchanged
+    raw_total = final_raw_count
+    if active_count is None:
+        # count() takes no filter, so fetch the matching IDs only; same
+        # filter as the export, so blocks never flagged count as active
+        try:
+            active_results = raw_collection.get(
+                limit=raw_total,
+                where={"distilled": {"$ne": True}},
+                include=[]
+            )
+            active_count = len(active_results['ids']) if active_results['ids'] else 0
+        except Exception:
+            # Fallback: count all and subtract marked
+            active_count = raw_total - marked_count
 
     log(f"Raw collection: {raw_total} blocks")
     log(f"  - Active: {active_count}")
@@ -15,7 +15,12 @@ Environment:
 
 import os
 import sys
+import hashlib
+import sqlite3
 import argparse
+from functools import lru_cache
+
+import numpy as np
 import chromadb
 from chromadb.config import Settings
 from openai import OpenAI
@@ -23,17 +28,59 @@ from openai import OpenAI
 # Configuration
 DATA_DIR = os.environ.get('IDEABLOCK_DATA_DIR', './data/ideablocks')
 CHROMA_DIR = os.path.join(DATA_DIR, 'chroma_db')
+EMBEDDING_CACHE_PATH = os.path.join(DATA_DIR, 'embeddings_cache.sqlite')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 EMBEDDING_MODEL = 'text-embedding-3-small'
 
 
+def _embedding_key(text):
+    """Content hash used as the embedding cache key (scoped to the model)."""
+    return hashlib.blake2b(f"{EMBEDDING_MODEL}\0{text}".encode(), digest_size=16).hexdigest()
+
+
+def _open_embedding_cache():
+    """Open the on-disk embedding cache, creating it if needed."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(EMBEDDING_CACHE_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vec BLOB)")
+    return conn
+
+
+@lru_cache(maxsize=1024)
+def _cached_query_embedding(query):
+    """Query embedding as a tuple, read from the on-disk cache when present."""
+    key = _embedding_key(query)
+    conn = _open_embedding_cache()
+
+    try:
+        row = conn.execute("SELECT vec FROM embeddings WHERE hash = ?", (key,)).fetchone()
+        if row:
+            return tuple(np.frombuffer(row[0], dtype=np.float32).tolist())
+
+        if not OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not set - required for semantic search")
+        client = OpenAI(api_key=OPENAI_API_KEY)
+        response = client.embeddings.create(model=EMBEDDING_MODEL, input=[query])
+
+        # Stored as float32, like the ingest scripts, so hits and misses match
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                (key, vector.tobytes())
+            )
+        return tuple(vector.tolist())
+    finally:
+        conn.close()
+
+
 def get_query_embedding(query: str):
-    """Generate embedding for query using OpenAI."""
-    if not OPENAI_API_KEY:
-        raise ValueError("OPENAI_API_KEY not set - required for semantic search")
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    response = client.embeddings.create(model=EMBEDDING_MODEL, input=[query])
-    return response.data[0].embedding
+    """Generate embedding for query using OpenAI.
+
+    Embeddings are cached in memory and in the embedding cache the ingest
+    scripts share, so repeating a query makes no API call.
+    """
+    return list(_cached_query_embedding(query))
 
 
 def get_client():
@@ -44,33 +91,27 @@ def get_client():
     )
 
 
-def get_best_collection(client, preferred='distilled'):
-    """Get the best available collection with fallback.
-
-    Args:
-        client: ChromaDB client
-        preferred: Preferred collection ('distilled' or 'raw')
+@lru_cache(maxsize=4)
+def _resolve_best(client, preferred):
+    """Name of the first non-empty collection, preferred one first.
 
-    Returns:
-        tuple: (collection, collection_name)
+    Raises LookupError when none has data, so misses are not cached.
     """
     collections = {c.name: c for c in client.list_collections()}
 
     # Try preferred collection first
     preferred_name = f"{preferred}_ideablocks"
     if preferred_name in collections:
-        col = collections[preferred_name]
-        if col.count() > 0:
-            return col, preferred_name
+        if collections[preferred_name].count() > 0:
+            return preferred_name
 
     # Fallback to other collection
     fallback = 'raw' if preferred == 'distilled' else 'distilled'
     fallback_name = f"{fallback}_ideablocks"
     if fallback_name in collections:
-        col = collections[fallback_name]
-        if col.count() > 0:
+        if collections[fallback_name].count() > 0:
             print(f"Note: {preferred_name} empty/missing, using {fallback_name}")
-            return col, fallback_name
+            return fallback_name
 
     # No collections with data
     if collections:
@@ -78,7 +119,40 @@ def get_best_collection(client, preferred='distilled'):
     else:
         print("No collections found. Run ingest first.")
 
-    return None, None
+    raise LookupError(preferred_name)
+
+
+def clear_collection_cache():
+    """Forget resolved collections, e.g. after creating or emptying one."""
+    _resolve_best.cache_clear()
+
+
+def get_best_collection(client, preferred='distilled'):
+    """Get the best available collection with fallback.
+
+    The choice is resolved once per client and preferred name; call
+    clear_collection_cache() after changing which collections hold data.
+
+    Args:
+        client: ChromaDB client
+        preferred: Preferred collection ('distilled' or 'raw')
+
+    Returns:
+        tuple: (collection, collection_name)
+    """
+    try:
+        name = _resolve_best(client, preferred)
+        return client.get_collection(name), name
+    except LookupError:
+        return None, None
+    except Exception:
+        # Collection went away since it was resolved; look again
+        clear_collection_cache()
+        try:
+            name = _resolve_best(client, preferred)
+            return client.get_collection(name), name
+        except LookupError:
+            return None, None
 
 
 def get_collection(client, name):
@@ -118,12 +192,8 @@ def search_collection(
         conditions.append({'tags': {'$contains': tag_filter.upper()}})
 
     if active_only:
-        conditions.append({
-            '$or': [
-                {'distilled': {'$eq': False}},
-                {'distilled': {'$exists': False}}
-            ]
-        })
+        # $ne also matches blocks that were never flagged
+        conditions.append({'distilled': {'$ne': True}})
 
     where = None
     if conditions:
@@ -152,43 +222,50 @@ def search_collection(
     return results
 
 
-def format_results(results, query, collection_name):
+def distances_to_similarities(distances):
+    """Convert ChromaDB distances to similarity scores in one numpy pass."""
+    d = np.asarray(distances, dtype=np.float64)
+    return np.where(d <= 1, np.maximum(0, 1 - d), 1 / (1 + d)).tolist()
+
+
+def build_result_records(results):
+    """Turn a ChromaDB query result into one dict per hit, best first."""
+    similarities = distances_to_similarities(results['distances'][0])
+    return [
+        {
+            'id': doc_id,
+            'similarity': similarity,
+            'name': meta.get('name'),
+            'critical_question': meta.get('critical_question'),
+            'trusted_answer': meta.get('trusted_answer'),
+            'metadata': meta
+        }
+        for doc_id, meta, similarity in zip(results['ids'][0], results['metadatas'][0], similarities)
+    ]
+
+
+def print_results(records, query, collection_name):
     """Format and display search results."""
 
-    if not results['ids'][0]:
+    if not records:
         print(f"\nNo results found for: '{query}'")
-        return []
+        return
 
     print(f"\n{'='*70}")
     print(f"Search: '{query}'")
     print(f"Collection: {collection_name}")
-    print(f"Found: {len(results['ids'][0])} results")
+    print(f"Found: {len(records)} results")
     print(f"{'='*70}")
 
-    formatted = []
-    for i, doc_id in enumerate(results['ids'][0]):
-        meta = results['metadatas'][0][i]
-        distance = results['distances'][0][i]
-
-        # Convert distance to similarity score
-        similarity = max(0, 1 - distance) if distance <= 1 else 1 / (1 + distance)
+    for i, result in enumerate(records):
+        meta = result['metadata']
 
-        result = {
-            'id': doc_id,
-            'name': meta.get('name', 'Unnamed'),
-            'critical_question': meta.get('critical_question', 'N/A'),
-            'trusted_answer': meta.get('trusted_answer', 'N/A'),
-            'similarity': similarity,
-            'metadata': meta
-        }
-        formatted.append(result)
-
-        print(f"\n[{i+1}] {result['name']}")
-        print(f"    Score: {similarity:.3f}")
-        print(f"    Q: {result['critical_question']}")
+        print(f"\n[{i+1}] {result['name'] or 'Unnamed'}")
+        print(f"    Score: {result['similarity']:.3f}")
+        print(f"    Q: {result['critical_question'] or 'N/A'}")
 
         # Truncate long answers
-        answer = result['trusted_answer']
+        answer = result['trusted_answer'] or 'N/A'
         if len(answer) > 200:
             answer = answer[:200] + "..."
         print(f"    A: {answer}")
@@ -207,8 +284,6 @@ def format_results(results, query, collection_name):
 
         print(f"    {'-'*50}")
 
-    return formatted
-
 
 def main():
     parser = argparse.ArgumentParser(description='Search IdeaBlocks in ChromaDB')
@@ -263,24 +338,12 @@ def main():
     )
 
     # Display results
+    records = build_result_records(results)
     if args.json:
         import json
-        formatted = []
-        for i, doc_id in enumerate(results['ids'][0]):
-            meta = results['metadatas'][0][i]
-            distance = results['distances'][0][i]
-            similarity = max(0, 1 - distance) if distance <= 1 else 1 / (1 + distance)
-            formatted.append({
-                'id': doc_id,
-                'similarity': similarity,
-                'name': meta.get('name'),
-                'critical_question': meta.get('critical_question'),
-                'trusted_answer': meta.get('trusted_answer'),
-                'metadata': meta
-            })
-        print(json.dumps(formatted, indent=2))
+        print(json.dumps(records, indent=2))
     else:
-        format_results(results, args.query, collection_name)
+        print_results(records, args.query, collection_name)
 
 
 if __name__ == '__main__':
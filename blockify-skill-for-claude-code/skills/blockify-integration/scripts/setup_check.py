@@ -7,6 +7,9 @@ Usage:
     python setup_check.py --install  # Auto-install missing dependencies
     python setup_check.py --status   # Show detailed status only
 
+--install reuses pip's wheel cache between runs; set PIP_CACHE_DIR to
+keep it somewhere persistent (e.g. a CI cache volume).
+
 Exit codes:
     0 = Ready
     1 = Missing dependencies (fixable with --install)
@@ -15,18 +18,33 @@ Exit codes:
 
 import os
 import sys
+import sqlite3
 import subprocess
+import importlib
+import importlib.util
+from functools import lru_cache
+
+REQUIRED_PACKAGES = ('requests', 'chromadb', 'openai')
 
-REQUIRED_PACKAGES = ['requests', 'chromadb', 'openai']
+# Environment, read once at startup
+BLOCKIFY_API_KEY = os.environ.get('BLOCKIFY_API_KEY')
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 DISTILL_SERVICE_URL = os.environ.get('DISTILL_SERVICE_URL', 'http://localhost:8315')
+DATA_DIR = os.environ.get('IDEABLOCK_DATA_DIR', './data/ideablocks')
+CHROMA_DIR = os.path.join(DATA_DIR, 'chroma_db')
+HEALTH_TIMEOUT = (1, 2)  # Connect/read seconds, so a stopped service fails fast
 
 
+@lru_cache(maxsize=None)
 def check_package(name):
-    """Check if package is installed."""
+    """Check if package is installed (each name is probed once).
+
+    Only the import system's finders are consulted; the package itself is
+    not imported, so heavy packages such as chromadb cost nothing here.
+    """
     try:
-        __import__(name)
-        return True
-    except ImportError:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
         return False
 
 
@@ -34,20 +52,36 @@ def check_api_keys():
     """Check required API keys."""
     issues = []
 
-    if not os.environ.get('BLOCKIFY_API_KEY'):
+    if not BLOCKIFY_API_KEY:
         issues.append('BLOCKIFY_API_KEY not set')
 
-    if not os.environ.get('OPENAI_API_KEY'):
+    if not OPENAI_API_KEY:
         issues.append('OPENAI_API_KEY not set (required for embeddings)')
 
     return issues
 
 
+@lru_cache(maxsize=None)
+def _get_session():
+    """Keep-alive session, created on first use.
+
+    requests may not be installed yet, so it is imported here rather
+    than at module level.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 def check_distillation_service(url=DISTILL_SERVICE_URL):
     """Check if distillation service is running."""
     try:
-        import requests
-        response = requests.get(f"{url}/healthz", timeout=5)
+        response = _get_session().get(f"{url}/healthz", timeout=HEALTH_TIMEOUT)
         if response.status_code == 200:
             data = response.json()
             return True, data
@@ -56,18 +90,62 @@ def check_distillation_service(url=DISTILL_SERVICE_URL):
         return False, str(e)
 
 
-def get_chromadb_stats(chroma_dir):
-    """Get ChromaDB collection statistics."""
+# Block count per collection of the default database, in one query. Each
+# block has one row in its collection's metadata segment.
+_COLLECTION_COUNTS_SQL = """
+    SELECT c.name, COUNT(e.id)
+    FROM collections c
+    JOIN databases d ON d.id = c.database_id AND d.name = 'default_database'
+    LEFT JOIN segments s ON s.collection = c.id AND s.scope = 'METADATA'
+    LEFT JOIN embeddings e ON e.segment_id = s.id
+    GROUP BY c.id
+    ORDER BY c.name
+"""
+
+
+def _read_collection_counts(chroma_dir):
+    """Read block counts straight from ChromaDB's sqlite file.
+
+    Raises sqlite3.Error if the file is missing or its schema differs
+    from the one this query was written for.
+    """
+    db_path = os.path.abspath(os.path.join(chroma_dir, 'chroma.sqlite3'))
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
     try:
-        import chromadb
-        from chromadb.config import Settings
+        return dict(conn.execute(_COLLECTION_COUNTS_SQL).fetchall())
+    finally:
+        conn.close()
+
 
-        client = chromadb.PersistentClient(
-            path=chroma_dir,
-            settings=Settings(anonymized_telemetry=False)
-        )
+@lru_cache(maxsize=4)
+def _get_chroma_client(chroma_dir):
+    """ChromaDB client for chroma_dir, created once per directory."""
+    import chromadb
+    from chromadb.config import Settings
 
-        collections = client.list_collections()
+    return chromadb.PersistentClient(
+        path=chroma_dir,
+        settings=Settings(anonymized_telemetry=False)
+    )
+
+
+def get_chromadb_stats(chroma_dir):
+    """Get ChromaDB collection statistics.
+
+    Uses a single read-only sqlite query, which also avoids importing
+    chromadb; falls back to counting through the client. A missing
+    directory has no collections, and is not created as a side effect.
+    """
+    if not os.path.isdir(chroma_dir):
+        return {}
+
+    try:
+        return _read_collection_counts(chroma_dir)
+    except sqlite3.Error:
+        pass
+
+    try:
+        collections = _get_chroma_client(chroma_dir).list_collections()
         stats = {}
 
         for col in collections:
@@ -83,18 +161,38 @@ def install_packages():
     script_dir = os.path.dirname(os.path.abspath(__file__))
     requirements = os.path.join(script_dir, '..', 'requirements.txt')
 
+    pip_install = [sys.executable, '-m', 'pip', 'install', '--disable-pip-version-check', '--no-input',
+                   '--prefer-binary']
+
     if os.path.exists(requirements):
-        subprocess.check_call([sys.executable, '-m', 'pip', 'install', '-r', requirements])
+        subprocess.check_call(pip_install + ['-r', requirements])
     else:
-        for pkg in REQUIRED_PACKAGES:
-            if not check_package(pkg):
-                subprocess.check_call([sys.executable, '-m', 'pip', 'install', pkg])
+        # One pip run resolves everything missing together
+        missing = [pkg for pkg in REQUIRED_PACKAGES if not check_package(pkg)]
+        if missing:
+            subprocess.check_call(pip_install + missing)
+
+    # Results from before the install are stale now, as are the finders'
+    # directory listings
+    check_package.cache_clear()
+    importlib.invalidate_caches()
 
 
 def main():
-    print("=" * 60)
-    print("BLOCKIFY INTEGRATION STATUS")
-    print("=" * 60)
+    # Output is collected and written in a few batches. The buffer is
+    # flushed before slow steps, so progress shows and stays in order
+    # with pip's own output.
+    lines = []
+    emit = lines.append
+
+    def flush():
+        sys.stdout.write(''.join(f"{line}\n" for line in lines))
+        sys.stdout.flush()
+        lines.clear()
+
+    emit("=" * 60)
+    emit("BLOCKIFY INTEGRATION STATUS")
+    emit("=" * 60)
 
     auto_install = '--install' in sys.argv
     status_only = '--status' in sys.argv
@@ -103,93 +201,95 @@ def main():
     missing_packages = [pkg for pkg in REQUIRED_PACKAGES if not check_package(pkg)]
 
     if missing_packages:
-        print(f"\n[X] Missing packages: {', '.join(missing_packages)}")
+        emit(f"\n[X] Missing packages: {', '.join(missing_packages)}")
         if auto_install:
-            print("    Installing...")
+            emit("    Installing...")
+            flush()
             install_packages()
-            print("    Done!")
+            emit("    Done!")
             missing_packages = []
         else:
-            print("    Run: pip install -r requirements.txt")
-            print("    Or:  python setup_check.py --install")
+            emit("    Run: pip install -r requirements.txt")
+            emit("    Or:  python setup_check.py --install")
     else:
-        print("\n[OK] Python packages installed")
+        emit("\n[OK] Python packages installed")
 
     # Check API keys
     key_issues = check_api_keys()
 
     if key_issues:
-        print(f"\n[X] API key issues:")
+        emit(f"\n[X] API key issues:")
         for issue in key_issues:
-            print(f"    - {issue}")
+            emit(f"    - {issue}")
         if not status_only:
-            print("\n    Set keys with:")
-            print("    export BLOCKIFY_API_KEY='blk_your_key'")
-            print("    export OPENAI_API_KEY='sk-your_key'")
+            emit("\n    Set keys with:")
+            emit("    export BLOCKIFY_API_KEY='blk_your_key'")
+            emit("    export OPENAI_API_KEY='sk-your_key'")
     else:
-        print("\n[OK] API keys configured")
+        emit("\n[OK] API keys configured")
 
     # Check data directory and ChromaDB
-    data_dir = os.environ.get('IDEABLOCK_DATA_DIR', './data/ideablocks')
-    chroma_dir = os.path.join(data_dir, 'chroma_db')
-
-    if os.path.exists(chroma_dir):
-        print(f"\n[OK] ChromaDB directory exists")
-        print(f"     Location: {chroma_dir}")
+    if os.path.isdir(CHROMA_DIR):
+        emit(f"\n[OK] ChromaDB directory exists")
+        emit(f"     Location: {CHROMA_DIR}")
 
         # Get collection stats
         if not missing_packages:
-            stats = get_chromadb_stats(chroma_dir)
+            stats = get_chromadb_stats(CHROMA_DIR)
             if "error" not in stats:
-                print("\n     Collections:")
+                emit("\n     Collections:")
                 if stats:
                     for name, count in stats.items():
-                        print(f"       - {name}: {count} blocks")
+                        emit(f"       - {name}: {count} blocks")
                 else:
-                    print("       (no collections yet)")
+                    emit("       (no collections yet)")
             else:
-                print(f"     Error reading stats: {stats['error']}")
+                emit(f"     Error reading stats: {stats['error']}")
     else:
-        print(f"\n[--] ChromaDB not initialized")
-        print(f"     Will create at: {chroma_dir}")
+        emit(f"\n[--] ChromaDB not initialized")
+        emit(f"     Will create at: {CHROMA_DIR}")
 
     # Check distillation service
-    print(f"\n[..] Checking distillation service at {DISTILL_SERVICE_URL}...")
+    emit(f"\n[..] Checking distillation service at {DISTILL_SERVICE_URL}...")
+    flush()
 
     if not missing_packages:
         healthy, info = check_distillation_service()
         if healthy:
-            print(f"[OK] Distillation service running")
-            print(f"     Version: {info.get('version', 'unknown')}")
-            print(f"     Active jobs: {info.get('jobs_active', 0)}")
-            print(f"     Completed (24h): {info.get('jobs_completed_24h', 0)}")
+            emit(f"[OK] Distillation service running")
+            emit(f"     Version: {info.get('version', 'unknown')}")
+            emit(f"     Active jobs: {info.get('jobs_active', 0)}")
+            emit(f"     Completed (24h): {info.get('jobs_completed_24h', 0)}")
         else:
-            print(f"[--] Distillation service not available")
-            print(f"     Error: {info}")
-            print(f"\n     To start the service:")
-            print(f"     cd blockify-distillation-service && docker-compose up -d")
+            emit(f"[--] Distillation service not available")
+            emit(f"     Error: {info}")
+            emit(f"\n     To start the service:")
+            emit(f"     cd blockify-distillation-service && docker-compose up -d")
     else:
-        print("[--] Cannot check (missing packages)")
+        emit("[--] Cannot check (missing packages)")
 
     # Summary
-    print("\n" + "=" * 60)
+    emit("\n" + "=" * 60)
 
     if missing_packages and not auto_install:
-        print("STATUS: NOT READY")
-        print("ACTION: Install packages with --install flag")
-        sys.exit(1)
+        emit("STATUS: NOT READY")
+        emit("ACTION: Install packages with --install flag")
+        exit_code = 1
     elif key_issues:
-        print("STATUS: NOT READY")
-        print("ACTION: Set API keys (see above)")
-        sys.exit(2)
+        emit("STATUS: NOT READY")
+        emit("ACTION: Set API keys (see above)")
+        exit_code = 2
     else:
-        print("STATUS: READY")
-        print("\nQuick commands:")
-        print("  Ingest:  python ingest_to_chromadb.py /path/to/docs/ --batch")
-        print("  Search:  python search_chromadb.py \"your query\"")
-        print("  Distill: python run_distillation.py")
-        print("  Full:    python run_full_pipeline.py /path/to/docs/")
-        sys.exit(0)
+        emit("STATUS: READY")
+        emit("\nQuick commands:")
+        emit("  Ingest:  python ingest_to_chromadb.py /path/to/docs/ --batch")
+        emit("  Search:  python search_chromadb.py \"your query\"")
+        emit("  Distill: python run_distillation.py")
+        emit("  Full:    python run_full_pipeline.py /path/to/docs/")
+        exit_code = 0
+
+    flush()
+    sys.exit(exit_code)
 
 
 if __name__ == '__main__':
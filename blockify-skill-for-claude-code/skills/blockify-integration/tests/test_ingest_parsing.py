@@ -0,0 +1,85 @@
+"""
+Unit tests for IdeaBlock parsing in ingest_to_chromadb.
+
+Run with: pytest tests/test_ingest_parsing.py -v
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+import ingest_to_chromadb as ingest
+
+
+PLAIN = """
+<ideablock>
+  <name>Plain Block</name>
+  <critical_question>What is plain?</critical_question>
+  <trusted_answer>Nothing special &amp; no markup.</trusted_answer>
+  <tags>IMPORTANT</tags>
+  <keywords>plain</keywords>
+  <entity><entity_name>PLAIN</entity_name><entity_type>CONCEPT</entity_type></entity>
+</ideablock>
+"""
+
+MIXED = """
+<ideablock>
+  <name>Mixed Block</name>
+  <critical_question>How is <i>emphasis</i> kept?</critical_question>
+  <trusted_answer>Use <b>bold</b> text &amp; more</trusted_answer>
+  <tags>TECHNOLOGY</tags>
+  <keywords>markup</keywords>
+  <entity><entity_name>BOLD <b>TAG</b></entity_name><entity_type>CONCEPT</entity_type></entity>
+</ideablock>
+"""
+
+
+def parse_with(monkeypatch, content, parser):
+    """Run parse_ideablocks with only the given extractor available."""
+    with monkeypatch.context() as m:
+        m.setattr(ingest, '_LXML_AVAILABLE', parser == 'lxml')
+        if parser == 'regex':
+            # Make the well-formed path fail over to the regex extractor
+            def malformed(_content):
+                raise ingest.expat.ExpatError
+            m.setattr(ingest, '_extract_blocks_expat', malformed)
+        return ingest.parse_ideablocks(content)
+
+
+class TestParserParity:
+    """Every parser returns the same fields, so block IDs do not depend on which ran."""
+
+    @pytest.mark.parametrize("content", [PLAIN, MIXED, PLAIN + MIXED], ids=["plain", "mixed", "both"])
+    def test_lxml_matches_regex(self, monkeypatch, content):
+        pytest.importorskip("lxml")
+        expected = parse_with(monkeypatch, content, 'regex')
+        assert parse_with(monkeypatch, content, 'lxml') == expected
+
+    @pytest.mark.parametrize("content", [PLAIN, MIXED, PLAIN + MIXED], ids=["plain", "mixed", "both"])
+    def test_expat_matches_regex(self, monkeypatch, content):
+        expected = parse_with(monkeypatch, content, 'regex')
+        assert parse_with(monkeypatch, content, 'expat') == expected
+
+    def test_mixed_content_not_truncated(self, monkeypatch):
+        block, = parse_with(monkeypatch, MIXED, 'regex')
+        assert block['trusted_answer'] == 'Use <b>bold</b> text & more'
+        assert block['critical_question'] == 'How is <i>emphasis</i> kept?'
+        assert block['primary_entity'] == 'BOLD <b>TAG</b>'
+
+
+class TestPipelineParsing:
+    """run_full_pipeline keeps its own copy of the parser; it must agree too."""
+
+    @pytest.mark.parametrize("content", [PLAIN, MIXED, PLAIN + MIXED], ids=["plain", "mixed", "both"])
+    def test_lxml_matches_regex(self, monkeypatch, content):
+        pytest.importorskip("lxml")
+        import run_full_pipeline as pipeline
+
+        with monkeypatch.context() as m:
+            m.setattr(pipeline, '_LXML_AVAILABLE', False)
+            expected = pipeline.parse_ideablocks(content)
+        assert pipeline.parse_ideablocks(content) == expected
@@ -8,6 +8,8 @@ import sys
 import math
 from pathlib import Path
 
+import pytest
+
 # Add scripts directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
 
@@ -15,6 +17,7 @@ from benchmark.metrics import (
     CHAR_TO_TOKEN_RATIO,
     ENTERPRISE_DUP_FACTOR,
     calculate_vector_improvement,
+    calculate_vector_improvements,
     calculate_word_improvement,
     calculate_char_improvement,
     calculate_aggregate_performance,
@@ -46,73 +49,67 @@ class TestConstants:
 class TestVectorImprovement:
     """Tests for calculate_vector_improvement function."""
 
-    def test_normal_improvement(self):
+    @pytest.mark.parametrize('chunk_distance, distilled_distance, expected', [
         # chunk_distance=0.4, distilled_distance=0.2 → 2.0x improvement
-        result = calculate_vector_improvement(0.4, 0.2)
-        assert result == 2.0
-
-    def test_no_improvement(self):
+        pytest.param(0.4, 0.2, 2.0, id='normal_improvement'),
         # Same distances → 1.0x
-        result = calculate_vector_improvement(0.3, 0.3)
-        assert result == 1.0
-
-    def test_worse_performance(self):
+        pytest.param(0.3, 0.3, 1.0, id='no_improvement'),
         # distilled worse than chunks → <1.0
-        result = calculate_vector_improvement(0.2, 0.4)
-        assert result == 0.5
-
-    def test_zero_chunk_distance(self):
+        pytest.param(0.2, 0.4, 0.5, id='worse_performance'),
         # Zero chunk distance → 0 (invalid)
-        result = calculate_vector_improvement(0, 0.2)
-        assert result == 0.0
-
-    def test_zero_distilled_distance(self):
+        pytest.param(0, 0.2, 0.0, id='zero_chunk_distance'),
         # Zero distilled distance → 0 (invalid, would be infinite)
-        result = calculate_vector_improvement(0.4, 0)
-        assert result == 0.0
-
-    def test_negative_values(self):
+        pytest.param(0.4, 0, 0.0, id='zero_distilled_distance'),
         # Negative values → 0 (invalid)
-        result = calculate_vector_improvement(-0.4, 0.2)
-        assert result == 0.0
-        result = calculate_vector_improvement(0.4, -0.2)
-        assert result == 0.0
-
-    def test_none_values(self):
+        pytest.param(-0.4, 0.2, 0.0, id='negative_chunk_distance'),
+        pytest.param(0.4, -0.2, 0.0, id='negative_distilled_distance'),
         # None values → 0
-        result = calculate_vector_improvement(None, 0.2)
-        assert result == 0.0
-        result = calculate_vector_improvement(0.4, None)
-        assert result == 0.0
+        pytest.param(None, 0.2, 0.0, id='none_chunk_distance'),
+        pytest.param(0.4, None, 0.0, id='none_distilled_distance'),
+    ])
+    def test_vector_improvement(self, chunk_distance, distilled_distance, expected):
+        assert calculate_vector_improvement(chunk_distance, distilled_distance) == expected
+
+
+class TestVectorImprovements:
+    """Tests for calculate_vector_improvements function."""
+
+    def test_matches_scalar(self):
+        chunk = [0.4, 0.3, 0.2, 0, 0.4, -0.4, None]
+        distilled = [0.2, 0.3, 0.4, 0.2, 0, 0.2, 0.2]
+        result = calculate_vector_improvements(chunk, distilled)
+        expected = [calculate_vector_improvement(c, d) for c, d in zip(chunk, distilled)]
+        assert result.tolist() == expected
+
+    def test_length_mismatch(self):
+        with pytest.raises(ValueError):
+            calculate_vector_improvements([0.4, 0.3], [0.2])
 
 
 class TestWordImprovement:
     """Tests for calculate_word_improvement function."""
 
-    def test_normal_improvement(self):
+    @pytest.mark.parametrize('document_words, distilled_words, expected', [
         # 10000 words → 400 words = 25x improvement
-        result = calculate_word_improvement(10000, 400)
-        assert result == 25.0
-
-    def test_no_improvement(self):
-        result = calculate_word_improvement(1000, 1000)
-        assert result == 1.0
-
-    def test_zero_values(self):
-        assert calculate_word_improvement(0, 400) == 0.0
-        assert calculate_word_improvement(10000, 0) == 0.0
+        pytest.param(10000, 400, 25.0, id='normal_improvement'),
+        pytest.param(1000, 1000, 1.0, id='no_improvement'),
+        pytest.param(0, 400, 0.0, id='zero_document_words'),
+        pytest.param(10000, 0, 0.0, id='zero_distilled_words'),
+    ])
+    def test_word_improvement(self, document_words, distilled_words, expected):
+        assert calculate_word_improvement(document_words, distilled_words) == expected
 
 
 class TestCharImprovement:
     """Tests for calculate_char_improvement function."""
 
-    def test_normal_improvement(self):
-        result = calculate_char_improvement(50000, 2000)
-        assert result == 25.0
-
-    def test_zero_values(self):
-        assert calculate_char_improvement(0, 2000) == 0.0
-        assert calculate_char_improvement(50000, 0) == 0.0
+    @pytest.mark.parametrize('document_chars, distilled_chars, expected', [
+        pytest.param(50000, 2000, 25.0, id='normal_improvement'),
+        pytest.param(0, 2000, 0.0, id='zero_document_chars'),
+        pytest.param(50000, 0, 0.0, id='zero_distilled_chars'),
+    ])
+    def test_char_improvement(self, document_chars, distilled_chars, expected):
+        assert calculate_char_improvement(document_chars, distilled_chars) == expected
 
 
 class TestAggregatePerformance:
@@ -212,6 +209,10 @@ class TestAverageDistance:
         result = calculate_average_distance([0.1, None, 0.3, float('nan')])
         assert abs(result - 0.2) < 0.0001
 
+    def test_all_invalid(self):
+        result = calculate_average_distance([None, float('nan')])
+        assert result == 0.0
+
 
 class TestCosineSimilarity:
     """Tests for calculate_cosine_similarity function."""
@@ -236,6 +237,18 @@ class TestCosineSimilarity:
         result = calculate_cosine_similarity([1, 2], [1, 2, 3])
         assert result == 0.0
 
+    def test_unnormalized_vectors(self):
+        result = calculate_cosine_similarity([3, 4], [6, 8])
+        assert abs(result - 1.0) < 0.0001
+
+    def test_zero_vector(self):
+        result = calculate_cosine_similarity([0, 0], [1, 1])
+        assert result == 0.0
+
+    def test_none_vectors(self):
+        assert calculate_cosine_similarity(None, [1, 1]) == 0.0
+        assert calculate_cosine_similarity([1, 1], None) == 0.0
+
 
 class TestCosineDistance:
     """Tests for calculate_cosine_distance function."""
@@ -251,6 +264,9 @@ class TestCosineDistance:
         result = calculate_cosine_distance(vec1, vec2)
         assert result == 1.0
 
+    def test_none_vector(self):
+        assert calculate_cosine_distance(None, [1, 1]) == 1.0
+
 
 class TestCountBlockChars:
     """Tests for count_block_chars function."""
@@ -325,25 +341,17 @@ class TestAnalyzeWordFrequencies:
 class TestValidateBenchmarkDistances:
     """Tests for validate_benchmark_distances function."""
 
-    def test_valid_distances(self):
-        result = validate_benchmark_distances(0.4, 0.3, 0.2)
-        assert result is True
-
-    def test_zero_distance(self):
-        result = validate_benchmark_distances(0, 0.3, 0.2)
-        assert result is False
-
-    def test_negative_distance(self):
-        result = validate_benchmark_distances(0.4, -0.3, 0.2)
-        assert result is False
-
-    def test_nan_distance(self):
-        result = validate_benchmark_distances(float('nan'), 0.3, 0.2)
-        assert result is False
-
-    def test_non_numeric(self):
-        result = validate_benchmark_distances("0.4", 0.3, 0.2)
-        assert result is False
+    @pytest.mark.parametrize('distances, expected', [
+        pytest.param((0.4, 0.3, 0.2), True, id='valid_distances'),
+        pytest.param((0, 0.3, 0.2), False, id='zero_distance'),
+        pytest.param((0.4, -0.3, 0.2), False, id='negative_distance'),
+        pytest.param((float('nan'), 0.3, 0.2), False, id='nan_distance'),
+        # Queries without any embedded result report an infinite distance
+        pytest.param((0.4, 0.3, float('inf')), False, id='infinite_distance'),
+        pytest.param(("0.4", 0.3, 0.2), False, id='non_numeric'),
+    ])
+    def test_validate(self, distances, expected):
+        assert validate_benchmark_distances(*distances) is expected
 
 
 class TestTokenStats: